@@ -0,0 +1,41 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+
+from .cache import lookup_catalog_response, lookup_recipes_response
+
+CACHE_LOOKUPS = {
+    'recipes-list': lookup_recipes_response,
+    'tags-list': lookup_catalog_response,
+    'tags-detail': lookup_catalog_response,
+    'ingredients-list': lookup_catalog_response,
+    'ingredients-detail': lookup_catalog_response,
+}
+
+
+def async_read_view(view, lookup):
+    sync_view = sync_to_async(view, thread_sensitive=True)
+    # Поиск в кэше может обращаться к базе (DatabaseCache), поэтому идёт в
+    # потоке запроса: его соединение закрывается по request_finished.
+    async_lookup = sync_to_async(lookup, thread_sensitive=True)
+
+    @wraps(view)
+    async def async_view(request, *args, **kwargs):
+        if (
+            request.method == 'GET'
+            and 'HTTP_AUTHORIZATION' not in request.META
+        ):
+            response = await async_lookup(request)
+            if response is not None:
+                return response
+        return await sync_view(request, *args, **kwargs)
+
+    return async_view
+
+
+def async_read_urls(urls):
+    for pattern in urls:
+        lookup = CACHE_LOOKUPS.get(pattern.name)
+        if lookup is not None:
+            pattern.callback = async_read_view(pattern.callback, lookup)
+    return urls
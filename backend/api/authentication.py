@@ -0,0 +1,52 @@
+import copy
+import time
+
+from django.conf import settings
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.permissions import SAFE_METHODS
+
+from .cache import get_token_version
+from .lru import ExpiringLRUCache
+
+token_cache = ExpiringLRUCache(
+    size=settings.TOKEN_CACHE_SIZE,
+    ttl=settings.TOKEN_CACHE_TTL
+)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Кеширует токены в процессе для безопасных методов.
+
+    Раз в `TOKEN_CACHE_CHECK_INTERVAL` секунд запись сверяется с версией
+    токена в общем кеше: её меняют выход, удаление токена, сохранение и
+    удаление пользователя. Изменяющие запросы всегда читают пользователя из
+    базы.
+    """
+
+    use_cache = True
+
+    def authenticate(self, request):
+        self.use_cache = request.method in SAFE_METHODS
+        return super().authenticate(request)
+
+    def authenticate_credentials(self, key):
+        if not self.use_cache:
+            return super().authenticate_credentials(key)
+        entry = token_cache.get(key)
+        if entry is not None and self.is_current(key, entry):
+            user, token, _, _ = entry
+            return copy.copy(user), token
+        version = get_token_version(key)
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, [user, token, version, time.monotonic()])
+        return copy.copy(user), token
+
+    @staticmethod
+    def is_current(key, entry):
+        checked_at = time.monotonic()
+        if checked_at - entry[3] < settings.TOKEN_CACHE_CHECK_INTERVAL:
+            return True
+        if get_token_version(key) != entry[2]:
+            return False
+        entry[3] = checked_at
+        return True
@@ -0,0 +1,171 @@
+import hashlib
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import (
+    get_conditional_response, patch_cache_control, quote_etag
+)
+from rest_framework.renderers import JSONRenderer
+
+CATALOG_VERSION_KEY = 'catalog:version'
+RECIPES_GENERATION_KEY = 'recipes:generation'
+TOKEN_VERSION_KEY = 'token:version:{}'
+RECIPES_CACHE_PARAMS = (
+    'author', 'tags', 'page', 'limit', 'ordering', 'pagination', 'cursor',
+    'search'
+)
+
+
+def get_version(key, timeout):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key, timeout):
+    try:
+        cache.incr(key)
+    except ValueError:
+        get_version(key, timeout)
+
+
+def get_catalog_version():
+    return get_version(CATALOG_VERSION_KEY, settings.CATALOG_CACHE_TIMEOUT)
+
+
+def bump_catalog_version():
+    bump_version(CATALOG_VERSION_KEY, settings.CATALOG_CACHE_TIMEOUT)
+
+
+def get_recipes_generation():
+    return get_version(
+        RECIPES_GENERATION_KEY, settings.RECIPES_CACHE_TIMEOUT
+    )
+
+
+def bump_recipes_generation():
+    bump_version(RECIPES_GENERATION_KEY, settings.RECIPES_CACHE_TIMEOUT)
+
+
+def get_token_version(key):
+    return get_version(TOKEN_VERSION_KEY.format(key), settings.TOKEN_CACHE_TTL)
+
+
+def bump_token_version(key):
+    bump_version(TOKEN_VERSION_KEY.format(key), settings.TOKEN_CACHE_TTL)
+
+
+recipes_cache_stats = Counter()
+recipes_cache_stats_lock = threading.Lock()
+
+
+def count_recipes_cache(status):
+    with recipes_cache_stats_lock:
+        recipes_cache_stats[status] += 1
+
+
+def get_recipes_cache_stats():
+    with recipes_cache_stats_lock:
+        hits = recipes_cache_stats['hits']
+        misses = recipes_cache_stats['misses']
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / (hits + misses), 4) if hits + misses else 0
+    }
+
+
+def get_query_key(request, names=None):
+    return '&'.join(
+        f'{name}={value}'
+        for name, values in sorted(request.GET.lists())
+        if names is None or name in names
+        for value in sorted(values)
+    )
+
+
+def hash_key(*parts):
+    return hashlib.md5('\n'.join(parts).encode()).hexdigest()
+
+
+def get_catalog_key(request):
+    return 'catalog:{}:{}'.format(
+        get_catalog_version(),
+        hash_key(request.path, get_query_key(request))
+    )
+
+
+def catalog_response(request, entry):
+    body, etag = entry
+    response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    patch_cache_control(
+        response, public=True, max_age=settings.CATALOG_MAX_AGE
+    )
+    return get_conditional_response(request, etag=etag, response=response)
+
+
+def lookup_catalog_response(request):
+    entry = cache.get(get_catalog_key(request))
+    if entry is None:
+        return None
+    return catalog_response(request, entry)
+
+
+def cached_catalog_response(request, view, *args, **kwargs):
+    key = get_catalog_key(request)
+    entry = cache.get(key)
+    if entry is None:
+        response = view(request, *args, **kwargs)
+        if response.status_code != 200:
+            return response
+        body = JSONRenderer().render(response.data)
+        entry = (body, quote_etag(hashlib.md5(body).hexdigest()))
+        cache.set(key, entry, settings.CATALOG_CACHE_TIMEOUT)
+    return catalog_response(request, entry)
+
+
+def get_recipes_key(request):
+    return 'recipes:{}:{}'.format(
+        get_recipes_generation(),
+        hash_key(
+            request.get_host(), get_query_key(request, RECIPES_CACHE_PARAMS)
+        )
+    )
+
+
+def recipes_response(body, cache_status):
+    response = HttpResponse(body, content_type='application/json')
+    response['X-Cache'] = cache_status
+    return response
+
+
+def lookup_recipes_response(request):
+    body = cache.get(get_recipes_key(request))
+    if body is None:
+        return None
+    count_recipes_cache('hits')
+    return recipes_response(body, 'HIT')
+
+
+def cached_recipes_response(request, view, *args, **kwargs):
+    key = get_recipes_key(request)
+    body = cache.get(key)
+    if body is None:
+        count_recipes_cache('misses')
+        response = view(request, *args, **kwargs)
+        if response.status_code != 200:
+            return response
+        body = JSONRenderer().render(response.data)
+        cache.set(key, body, settings.RECIPES_CACHE_TIMEOUT)
+        cache_status = 'MISS'
+    else:
+        count_recipes_cache('hits')
+        cache_status = 'HIT'
+    return recipes_response(body, cache_status)
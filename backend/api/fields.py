@@ -1,14 +1,99 @@
 import base64
-from django.core.files.base import ContentFile
+import binascii
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import (
+    InMemoryUploadedFile, TemporaryUploadedFile
+)
+from PIL import Image
 from rest_framework import serializers
 
+BASE64_SEPARATOR = ';base64,'
+BASE64_CHUNK_SIZE = 64 * 1024
+
+
+class Base64TemporaryUploadedFile(TemporaryUploadedFile):
+
+    def __del__(self):
+        self.close()
+
 
 class Base64ImageField(serializers.ImageField):
+    default_error_messages = {
+        'max_size': 'Размер изображения не должен превышать {max_size} байт.',
+        'max_pixels': (
+            'Изображение не должно содержать больше {max_pixels} пикселей.'
+        ),
+    }
 
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
-
+            data = self.decode(data)
         return super().to_internal_value(data)
+
+    def create_file(self, ext, size):
+        name = 'temp.' + ext
+        content_type = 'image/' + ext
+        if size > settings.FILE_UPLOAD_MAX_MEMORY_SIZE:
+            return Base64TemporaryUploadedFile(name, content_type, 0, None)
+        return InMemoryUploadedFile(
+            BytesIO(), None, name, content_type, 0, None
+        )
+
+    def decode(self, data):
+        start = data.find(BASE64_SEPARATOR)
+        if start == -1:
+            self.fail('invalid_image')
+        ext = data[len('data:image/'):start]
+        start += len(BASE64_SEPARATOR)
+        max_size = settings.BASE64_IMAGE_MAX_SIZE
+        if (len(data) - start) // 4 * 3 > max_size:
+            self.fail('max_size', max_size=max_size)
+        file = self.create_file(ext, (len(data) - start) // 4 * 3)
+        remainder = ''
+        size = None
+        try:
+            for position in range(start, len(data), BASE64_CHUNK_SIZE):
+                chunk = remainder + ''.join(
+                    data[position:position + BASE64_CHUNK_SIZE].split()
+                )
+                usable = len(chunk) // 4 * 4
+                file.write(base64.b64decode(chunk[:usable]))
+                remainder = chunk[usable:]
+                if position == start:
+                    size = self.read_size(file)
+                    if size is not None:
+                        self.validate_pixels(file, size)
+            if remainder:
+                file.write(base64.b64decode(remainder))
+        except (binascii.Error, ValueError):
+            file.close()
+            self.fail('invalid_image')
+        file.size = file.tell()
+        if size is None:
+            size = self.read_size(file)
+            if size is None:
+                file.close()
+                self.fail('invalid_image')
+            self.validate_pixels(file, size)
+        file.seek(0)
+        return file
+
+    @staticmethod
+    def read_size(file):
+        position = file.tell()
+        file.seek(0)
+        try:
+            return Image.open(file).size
+        except Exception:
+            return None
+        finally:
+            file.seek(position)
+
+    def validate_pixels(self, file, size):
+        max_pixels = settings.BASE64_IMAGE_MAX_PIXELS
+        width, height = size
+        if width * height > max_pixels:
+            file.close()
+            self.fail('max_pixels', max_pixels=max_pixels)
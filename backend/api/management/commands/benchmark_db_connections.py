@@ -0,0 +1,60 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.utils import load_backend
+
+DIRECT_ENGINE = 'django.db.backends.postgresql'
+POOLED_ENGINE = 'backend.postgresql_pool'
+
+
+class Command(BaseCommand):
+    help = 'Задержка соединения с БД на запрос: без пула и с пулом'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Нужна база PostgreSQL')
+        results = {}
+        for engine in (DIRECT_ENGINE, POOLED_ENGINE):
+            wrapper = load_backend(engine).DatabaseWrapper(
+                {
+                    **connection.settings_dict,
+                    'ENGINE': engine,
+                    'CONN_MAX_AGE': 0,
+                    'POOL': {
+                        **connection.settings_dict.get('POOL', {}),
+                        'SIZE': 1
+                    }
+                },
+                alias=f'benchmark:{engine}'
+            )
+            results[engine] = self.measure(wrapper, options['requests'])
+            pool = getattr(wrapper, 'pool', None)
+            if pool is not None:
+                pool.closeall()
+        for engine, latencies in results.items():
+            self.stdout.write(
+                f'{engine}: среднее {statistics.mean(latencies):.2f} мс, '
+                f'p95 {statistics.quantiles(latencies, n=20)[-1]:.2f} мс'
+            )
+        saved = (
+            statistics.mean(results[DIRECT_ENGINE])
+            - statistics.mean(results[POOLED_ENGINE])
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Экономия на запрос: {saved:.2f} мс'
+        ))
+
+    def measure(self, wrapper, requests):
+        latencies = []
+        for _ in range(requests):
+            started_at = time.perf_counter()
+            with wrapper.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            wrapper.close()
+            latencies.append((time.perf_counter() - started_at) * 1000)
+        return latencies
@@ -0,0 +1,58 @@
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Нагрузочная проверка запущенного сервера: RPS и перцентили'
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='+')
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--warmup', type=int, default=50)
+        parser.add_argument('--token')
+
+    def handle(self, *args, **options):
+        headers = {}
+        if options['token']:
+            headers['Authorization'] = f'Token {options["token"]}'
+        sessions = threading.local()
+
+        def fetch(url):
+            if not hasattr(sessions, 'session'):
+                sessions.session = requests.Session()
+                sessions.session.headers.update(headers)
+            started_at = time.perf_counter()
+            try:
+                status = sessions.session.get(url, timeout=30).status_code
+            except requests.RequestException:
+                status = None
+            return status, time.perf_counter() - started_at
+
+        urls = options['urls']
+        for number in range(options['warmup']):
+            fetch(urls[number % len(urls)])
+        started_at = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            results = list(pool.map(fetch, (
+                urls[number % len(urls)]
+                for number in range(options['requests'])
+            )))
+        elapsed = time.perf_counter() - started_at
+        latencies = sorted(latency for _, latency in results)
+        errors = sum(1 for status, _ in results if status != 200)
+        if errors == len(results):
+            raise CommandError('Все запросы завершились ошибкой')
+        percentiles = statistics.quantiles(latencies, n=100)
+        self.stdout.write(
+            f'{len(results) / elapsed:.0f} запросов/с, '
+            f'p50 {percentiles[49] * 1000:.1f} мс, '
+            f'p95 {percentiles[94] * 1000:.1f} мс, '
+            f'p99 {percentiles[98] * 1000:.1f} мс, '
+            f'ошибок {errors}'
+        )
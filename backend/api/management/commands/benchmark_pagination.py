@@ -0,0 +1,90 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.pagination import Cursor
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.pagination import RecipeCursorPagination
+from api.views import RecipeView
+from recipes.models import Recipe
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Сравнение задержки первой и глубокой страницы списка рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page', type=int, default=10000)
+        parser.add_argument('--limit', type=int, default=6)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        page, limit = options['page'], options['limit']
+        host = next(
+            (host.lstrip('.') for host in settings.ALLOWED_HOSTS
+             if host != '*'),
+            'localhost'
+        )
+        self.factory = APIRequestFactory(HTTP_HOST=host)
+        self.view = RecipeView.as_view({'get': 'list'})
+        self.user = User.objects.order_by('id').first()
+        self.repeat = options['repeat']
+        cases = [('page', 1, {'limit': limit})]
+        if page > 1:
+            cases.append(('page', page, {'limit': limit, 'page': page}))
+        cases.append(('cursor', 1, {'limit': limit, 'pagination': 'cursor'}))
+        if page > 1:
+            cases.append(('cursor', page, {
+                'limit': limit,
+                'pagination': 'cursor',
+                'cursor': self.get_deep_cursor(page, (page - 1) * limit)
+            }))
+        for mode, number, params in cases:
+            timings, queries = self.measure(params)
+            self.stdout.write(
+                f'{mode:>6} страница {number:>7}: '
+                f'медиана {statistics.median(timings):7.2f} мс, '
+                f'p95 {self.percentile(timings, 95):7.2f} мс, '
+                f'запросов к БД {queries}'
+            )
+
+    @staticmethod
+    def get_deep_cursor(page, offset):
+        boundary = Recipe.objects.order_by(
+            'created_at', 'id'
+        ).values_list('created_at', flat=True)[offset - 1:offset].first()
+        if boundary is None:
+            raise CommandError(
+                f'Для страницы {page} нужно больше {offset} рецептов: '
+                'запустите seed_recipes'
+            )
+        paginator = RecipeCursorPagination()
+        paginator.base_url = '/api/recipes/'
+        return paginator.encode_cursor(
+            Cursor(offset=0, reverse=False, position=boundary)
+        ).split('cursor=')[1]
+
+    def measure(self, params):
+        timings = []
+        for _ in range(self.repeat):
+            request = self.factory.get('/api/recipes/', params)
+            force_authenticate(request, self.user)
+            with CaptureQueriesContext(connection) as context:
+                started_at = time.perf_counter()
+                response = self.view(request)
+                response.render()
+                timings.append((time.perf_counter() - started_at) * 1000)
+            if response.status_code != 200:
+                raise CommandError(f'{params}: {response.status_code}')
+        return timings, len(context)
+
+    @staticmethod
+    def percentile(values, percent):
+        values = sorted(values)
+        return values[min(len(values) - 1, len(values) * percent // 100)]
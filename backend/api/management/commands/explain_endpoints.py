@@ -0,0 +1,131 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.views import CustomUserViewSet, RecipeView
+from recipes.models import Favorite, ShoppingCart
+
+User = get_user_model()
+
+MIGRATION_INDEXES = (
+    'recipe_created_at_idx',
+    'recipe_author_created_at_idx',
+    'subscribe_owner_user_idx',
+)
+MIGRATION_CONSTRAINTS = (
+    (Favorite, 'unique_favorite_user_recipe'),
+    (ShoppingCart, 'unique_shoppingcart_user_recipe'),
+)
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN ANALYZE для запросов основных эндпоинтов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='-')
+        parser.add_argument(
+            '--without-indexes',
+            action='store_true',
+            help='Снять планы без индексов миграции 0003: индексы удаляются '
+                 'в транзакции, которая затем откатывается'
+        )
+
+    def handle(self, *args, **options):
+        user = User.objects.annotate(
+            subscriptions=Count('subscribers')
+        ).filter(subscriptions__gt=0).order_by('id').first()
+        if user is None:
+            raise CommandError('Нет данных: запустите seed_recipes')
+        author = User.objects.filter(
+            recipes__isnull=False
+        ).order_by('id').first()
+        host = next(
+            (host.lstrip('.') for host in settings.ALLOWED_HOSTS
+             if host != '*'),
+            'localhost'
+        )
+        factory = APIRequestFactory(HTTP_HOST=host)
+        recipes = RecipeView.as_view({'get': 'list'})
+        cases = (
+            ('GET /api/recipes/', recipes, '/api/recipes/', {}),
+            ('GET /api/recipes/?author=', recipes, '/api/recipes/', {
+                'author': author.id
+            }),
+            ('GET /api/recipes/?is_favorited=1', recipes, '/api/recipes/', {
+                'is_favorited': 1
+            }),
+            (
+                'GET /api/recipes/?is_in_shopping_cart=1',
+                recipes,
+                '/api/recipes/',
+                {'is_in_shopping_cart': 1}
+            ),
+            (
+                'GET /api/recipes/download_shopping_cart/',
+                RecipeView.as_view({'get': 'download'}),
+                '/api/recipes/download_shopping_cart/',
+                {}
+            ),
+            (
+                'GET /api/users/subscriptions/',
+                CustomUserViewSet.as_view({'get': 'subscriptions'}),
+                '/api/users/subscriptions/',
+                {'recipes_limit': 3}
+            ),
+        )
+        prefix = (
+            'EXPLAIN ANALYZE ' if connection.vendor == 'postgresql'
+            else 'EXPLAIN QUERY PLAN '
+        )
+        output = (
+            self.stdout if options['output'] == '-'
+            else open(options['output'], 'w', encoding='utf-8')
+        )
+        try:
+            with transaction.atomic():
+                if options['without_indexes']:
+                    self.drop_migration_indexes()
+                self.write_plans(cases, user, factory, prefix, output)
+                transaction.set_rollback(True)
+        finally:
+            if output is not self.stdout:
+                output.close()
+
+    @staticmethod
+    def drop_migration_indexes():
+        with connection.cursor() as cursor:
+            for name in MIGRATION_INDEXES:
+                cursor.execute(f'DROP INDEX {connection.ops.quote_name(name)}')
+            if connection.vendor != 'postgresql':
+                return
+            for model, name in MIGRATION_CONSTRAINTS:
+                cursor.execute('ALTER TABLE {} DROP CONSTRAINT {}'.format(
+                    connection.ops.quote_name(model._meta.db_table),
+                    connection.ops.quote_name(name)
+                ))
+
+    @staticmethod
+    def write_plans(cases, user, factory, prefix, output):
+        for title, view, path, params in cases:
+            request = factory.get(path, params)
+            force_authenticate(request, user)
+            with CaptureQueriesContext(connection) as context:
+                response = view(request)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                else:
+                    response.render()
+            output.write(f'=== {title} ({len(context)} запросов)\n')
+            for query in context.captured_queries:
+                output.write(f'--- {query["sql"]}\n')
+                with connection.cursor() as cursor:
+                    cursor.execute(prefix + query['sql'])
+                    for row in cursor.fetchall():
+                        output.write(
+                            ' '.join(str(column) for column in row) + '\n'
+                        )
+            output.write('\n')
@@ -0,0 +1,158 @@
+import json
+import sys
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import F
+
+from api.cache import bump_recipes_generation
+from api.serializers import RecordRecipeSerializer
+from recipes.feed import fan_out_recipes
+from recipes.models import (
+    Ingredient, IngredientRecipe, Recipe, Tag, TagRecipe
+)
+
+User = get_user_model()
+
+DEFAULT_BATCH_SIZE = 200
+
+
+class Command(BaseCommand):
+    help = (
+        'Массовый импорт рецептов из NDJSON в формате POST /api/recipes/'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл NDJSON или - для stdin')
+        parser.add_argument('--author', required=True, help='Email автора')
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE
+        )
+        parser.add_argument(
+            '--report', default='-', help='Файл для построчного отчёта'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            self.author = User.objects.get(email=options['author'])
+        except User.DoesNotExist:
+            raise CommandError(f'Автор {options["author"]} не найден')
+        self.context = {
+            'ingredient_map': Ingredient.objects.in_bulk(),
+            'tag_map': Tag.objects.in_bulk(),
+        }
+        self.report = (
+            sys.stdout if options['report'] == '-'
+            else open(options['report'], 'w', encoding='utf-8')
+        )
+        self.created = self.failed = 0
+        started_at = time.monotonic()
+        source = (
+            sys.stdin if options['path'] == '-'
+            else open(options['path'], encoding='utf-8')
+        )
+        try:
+            batch = []
+            for line_number, line in enumerate(source, start=1):
+                if not line.strip():
+                    continue
+                batch.append((line_number, line))
+                if len(batch) >= options['batch_size']:
+                    self.import_batch(batch)
+                    batch = []
+            if batch:
+                self.import_batch(batch)
+        finally:
+            if source is not sys.stdin:
+                source.close()
+            if self.report is not sys.stdout:
+                self.report.close()
+        if self.created:
+            bump_recipes_generation()
+        elapsed = time.monotonic() - started_at
+        self.stderr.write(
+            f'Импортировано {self.created}, с ошибками {self.failed} '
+            f'за {elapsed:.1f} с '
+            f'({(self.created + self.failed) / max(elapsed, 1e-6):.0f} '
+            'строк/с)'
+        )
+
+    def write_report(self, line_number, **result):
+        self.report.write(
+            json.dumps({'line': line_number, **result}, ensure_ascii=False)
+            + '\n'
+        )
+
+    def import_batch(self, batch):
+        valid = []
+        for line_number, line in batch:
+            try:
+                data = json.loads(line)
+            except json.JSONDecodeError as error:
+                self.failed += 1
+                self.write_report(line_number, status='error', errors={
+                    'non_field_errors': [f'Некорректный JSON: {error}']
+                })
+                continue
+            serializer = RecordRecipeSerializer(
+                data=data, context=self.context
+            )
+            if not serializer.is_valid():
+                self.failed += 1
+                self.write_report(
+                    line_number, status='error', errors=serializer.errors
+                )
+                continue
+            valid.append((line_number, serializer))
+        if not valid:
+            return
+        try:
+            recipes = self.save_batch(valid)
+        except Exception as error:
+            self.failed += len(valid)
+            for line_number, _ in valid:
+                self.write_report(line_number, status='error', errors={
+                    'non_field_errors': [str(error)]
+                })
+            return
+        self.created += len(recipes)
+        for (line_number, _), recipe in zip(valid, recipes):
+            self.write_report(line_number, status='ok', id=recipe.id)
+
+    @transaction.atomic
+    def save_batch(self, valid):
+        recipes, ingredient_rows, tag_rows = [], [], []
+        for _, serializer in valid:
+            validated_data = dict(serializer.validated_data)
+            ingredients, tags = serializer.split_validated_data(
+                validated_data
+            )
+            recipe = Recipe(author=self.author, **validated_data)
+            recipes.append(recipe)
+            ingredient_rows.extend(
+                IngredientRecipe(
+                    ingredient=ingredient['ingredient'],
+                    recipe=recipe,
+                    amount=ingredient['amount']
+                ) for ingredient in ingredients
+            )
+            tag_rows.extend(TagRecipe(tag=tag, recipe=recipe) for tag in tags)
+        if connection.features.can_return_rows_from_bulk_insert:
+            Recipe.objects.bulk_create(recipes)
+            User.objects.filter(pk=self.author.pk).update(
+                recipes_count=F('recipes_count') + len(recipes)
+            )
+            Recipe.objects.filter(
+                pk__in=[recipe.pk for recipe in recipes]
+            ).update_search_index()
+            transaction.on_commit(
+                lambda: fan_out_recipes(self.author.pk, recipes)
+            )
+        else:
+            for recipe in recipes:
+                recipe.save()
+        IngredientRecipe.objects.bulk_create(ingredient_rows)
+        TagRecipe.objects.bulk_create(tag_rows)
+        return recipes
@@ -2,6 +2,7 @@ from django.contrib.auth import get_user_model
 from djoser.serializers import UserSerializer
 from rest_framework import serializers
 
+from .cache import cached_catalog_response
 from .fields import Base64ImageField
 from recipes.models import Recipe, ShoppingCart, Subscribe, Tag
 
@@ -34,6 +35,8 @@ class UserBaseSerializer(UserSerializer):
                   'recipes_count')
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         if not self.context.get('request').user.is_authenticated:
             return False
         return Subscribe.objects.filter(
@@ -73,3 +76,29 @@ class ShoppingCartFavorite(serializers.ModelSerializer):
             instance=value,
             context=self.context
         ).data
+
+
+class CachedCatalogMixin:
+
+    def list(self, request, *args, **kwargs):
+        return cached_catalog_response(
+            request, super().list, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return cached_catalog_response(
+            request, super().retrieve, *args, **kwargs
+        )
+
+
+class CursorPaginationMixin:
+    cursor_pagination_class = None
+
+    @property
+    def paginator(self):
+        params = self.request.query_params
+        if not hasattr(self, '_paginator') and (
+            params.get('pagination') == 'cursor' or 'cursor' in params
+        ):
+            self._paginator = self.cursor_pagination_class()
+        return super().paginator
@@ -1,5 +1,20 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
 
 class RecipePagination(PageNumberPagination):
     page_size_query_param = 'limit'
+
+
+class RecipeCursorPagination(CursorPagination):
+    page_size_query_param = 'limit'
+    ordering = ('created_at', 'id')
+
+
+class UserCursorPagination(CursorPagination):
+    page_size_query_param = 'limit'
+    ordering = ('id',)
+
+
+class FeedCursorPagination(CursorPagination):
+    page_size_query_param = 'limit'
+    ordering = ('-feed_created_at', '-id')
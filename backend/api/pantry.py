@@ -0,0 +1,112 @@
+import heapq
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from django.conf import settings
+
+from recipes.models import IngredientRecipe
+
+
+class PantryIndex:
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._built_at = 0
+
+    def invalidate(self):
+        self._snapshot = None
+
+    def is_fresh(self, snapshot):
+        return (
+            snapshot is not None
+            and time.monotonic() - self._built_at < self.ttl
+        )
+
+    def get_snapshot(self):
+        snapshot = self._snapshot
+        if self.is_fresh(snapshot):
+            return snapshot
+        # Пока один поток перестраивает индекс, остальные ищут по старому
+        # снимку и ждут только при первой сборке.
+        if not self._lock.acquire(blocking=snapshot is None):
+            return snapshot
+        try:
+            if not self.is_fresh(self._snapshot):
+                self._snapshot = self.build()
+                self._built_at = time.monotonic()
+            return self._snapshot
+        finally:
+            self._lock.release()
+
+    def build(self):
+        recipes = self.load_recipes()
+        return recipes, self.build_postings(recipes)
+
+    @staticmethod
+    def load_recipes(recipe_ids=None):
+        rows = IngredientRecipe.objects.order_by('recipe_id')
+        if recipe_ids is not None:
+            rows = rows.filter(recipe__in=recipe_ids)
+        recipes = defaultdict(list)
+        for recipe_id, ingredient_id in rows.values_list(
+            'recipe_id', 'ingredient_id'
+        ).iterator():
+            recipes[recipe_id].append(ingredient_id)
+        return {key: tuple(value) for key, value in recipes.items()}
+
+    @staticmethod
+    def build_postings(recipes):
+        postings = defaultdict(lambda: array('q'))
+        for recipe_id, ingredient_ids in recipes.items():
+            for ingredient_id in ingredient_ids:
+                postings[ingredient_id].append(recipe_id)
+        return dict(postings)
+
+    def replace_recipe(self, recipe_id, ingredient_ids):
+        with self._lock:
+            if self._snapshot is None:
+                return
+            recipes, postings = self._snapshot
+            recipes, postings = dict(recipes), dict(postings)
+            for ingredient_id in recipes.pop(recipe_id, ()):
+                posting = array('q', postings[ingredient_id])
+                position = bisect_left(posting, recipe_id)
+                if position < len(posting) and posting[position] == recipe_id:
+                    del posting[position]
+                postings[ingredient_id] = posting
+            if ingredient_ids:
+                recipes[recipe_id] = ingredient_ids
+                for ingredient_id in ingredient_ids:
+                    posting = array('q', postings.get(ingredient_id, ()))
+                    posting.insert(bisect_left(posting, recipe_id), recipe_id)
+                    postings[ingredient_id] = posting
+            self._snapshot = recipes, postings
+
+    def update_recipe(self, recipe_id):
+        if self._snapshot is None:
+            return
+        self.replace_recipe(
+            recipe_id, self.load_recipes((recipe_id,)).get(recipe_id, ())
+        )
+
+    def remove_recipe(self, recipe_id):
+        self.replace_recipe(recipe_id, ())
+
+    def search(self, ingredient_ids, limit):
+        recipes, postings = self.get_snapshot()
+        hits = Counter()
+        for ingredient_id in set(ingredient_ids):
+            hits.update(postings.get(ingredient_id, ()))
+        ranked = heapq.nlargest(limit, (
+            (count / len(recipes[recipe_id]), count, recipe_id)
+            for recipe_id, count in hits.items()
+        ))
+        return [(recipe_id, coverage) for coverage, _, recipe_id in ranked]
+
+
+pantry_index = PantryIndex(ttl=settings.PANTRY_INDEX_TTL)
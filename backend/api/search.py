@@ -0,0 +1,104 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+
+from recipes.models import Ingredient
+
+TRIGRAM_LENGTH = 3
+
+
+class IngredientIndex:
+
+    def __init__(self, limit, ttl):
+        self.limit = limit
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._built_at = 0
+
+    def invalidate(self):
+        self._snapshot = None
+
+    def is_fresh(self, snapshot):
+        return (
+            snapshot is not None
+            and time.monotonic() - self._built_at < self.ttl
+        )
+
+    def get_snapshot(self):
+        snapshot = self._snapshot
+        if self.is_fresh(snapshot):
+            return snapshot
+        with self._lock:
+            if not self.is_fresh(self._snapshot):
+                self._snapshot = self.build()
+                self._built_at = time.monotonic()
+            return self._snapshot
+
+    def build(self):
+        rows = sorted(
+            (name.lower(), {
+                'id': pk,
+                'name': name,
+                'measurement_unit': measurement_unit
+            })
+            for pk, name, measurement_unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'
+            )
+        )
+        keys = [key for key, _ in rows]
+        trigrams = defaultdict(list)
+        for position, key in enumerate(keys):
+            for trigram in self.split_trigrams(key):
+                trigrams[trigram].append(position)
+        return keys, [item for _, item in rows], dict(trigrams)
+
+    @staticmethod
+    def split_trigrams(value):
+        return {
+            value[start:start + TRIGRAM_LENGTH]
+            for start in range(len(value) - TRIGRAM_LENGTH + 1)
+        }
+
+    def find_candidates(self, query, keys, trigrams):
+        if len(query) < TRIGRAM_LENGTH:
+            return range(len(keys))
+        postings = []
+        for trigram in self.split_trigrams(query):
+            if trigram not in trigrams:
+                return ()
+            postings.append(trigrams[trigram])
+        postings.sort(key=len)
+        candidates = set(postings[0]).intersection(*postings[1:])
+        return sorted(candidates)
+
+    def search(self, query):
+        keys, items, trigrams = self.get_snapshot()
+        query = query.strip().lower()
+        if not query:
+            return items[:self.limit]
+        result = []
+        position = bisect_left(keys, query)
+        while (
+            position < len(keys)
+            and keys[position].startswith(query)
+            and len(result) < self.limit
+        ):
+            result.append(items[position])
+            position += 1
+        for position in self.find_candidates(query, keys, trigrams):
+            if len(result) >= self.limit:
+                break
+            key = keys[position]
+            if query in key and not key.startswith(query):
+                result.append(items[position])
+        return result
+
+
+ingredient_index = IngredientIndex(
+    limit=settings.INGREDIENT_SEARCH_LIMIT,
+    ttl=settings.INGREDIENT_INDEX_TTL
+)
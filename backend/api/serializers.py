@@ -1,5 +1,6 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.shortcuts import get_object_or_404
+from django.db import transaction
 from rest_framework import serializers
 
 from recipes.models import (
@@ -13,8 +14,9 @@ from .mixins import (
     TagBaseSerializer, UserBaseSerializer,
 )
 from .utils import (
-    util_favorited_shopping_cart,
-    util_validate_recipe_subscriptions
+    SHOPPING_LIST_FORMATS,
+    util_format_ids,
+    util_favorited_shopping_cart
 )
 
 User = get_user_model()
@@ -110,22 +112,44 @@ class SubscribeSerializerSPE(UserBaseSerializer):
         )
 
     def get_recipes_count(self, obj):
-        return Recipe.objects.filter(author=obj.id).count()
+        return obj.owner.recipes_count
 
     def get_recipes(self, obj):
-        url = self.context.get('request').build_absolute_uri()
-        if 'recipes_limit' in url:
-            url, number = url.split('recipes_limit=')
-            return RecipeSerializer(
-                Recipe.objects.filter(author=obj.owner)[:int(number)],
-                many=True
-            ).data
+        if hasattr(obj.owner, 'limited_recipes'):
+            return RecipeSerializer(obj.owner.limited_recipes, many=True).data
         return RecipeSerializer(
-            Recipe.objects.filter(author=obj.owner),
+            Recipe.objects.filter(
+                author=obj.owner_id
+            ).order_by(
+                'created_at', 'id'
+            )[:self.context.get('recipes_limit')],
             many=True
         ).data
 
 
+class RecipesLimitSerializer(serializers.Serializer):
+    recipes_limit = serializers.IntegerField(min_value=1, required=False)
+
+
+class PantrySerializer(serializers.Serializer):
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False
+    )
+    limit = serializers.IntegerField(
+        min_value=1,
+        max_value=settings.PANTRY_SEARCH_MAX_LIMIT,
+        default=settings.PANTRY_SEARCH_LIMIT
+    )
+
+
+class ShoppingListFormatSerializer(serializers.Serializer):
+    format = serializers.ChoiceField(
+        choices=tuple(SHOPPING_LIST_FORMATS),
+        default='txt'
+    )
+
+
 class SubscribeSerializer(serializers.ModelSerializer):
 
     class Meta:
@@ -174,19 +198,22 @@ class ReadRecipeSerializer(serializers.ModelSerializer):
         read_only_fields = ('author',)
 
     def get_is_favorited(self, obj):
-        return util_favorited_shopping_cart(self, obj, Favorite)
+        return util_favorited_shopping_cart(
+            self, obj, Favorite, 'is_favorited'
+        )
 
     def get_is_in_shopping_cart(self, obj):
-        return util_favorited_shopping_cart(self, obj, ShoppingCart)
+        return util_favorited_shopping_cart(
+            self, obj, ShoppingCart, 'is_in_shopping_cart'
+        )
 
 
 class RecordRecipeSerializer(serializers.ModelSerializer):
     author = BaseUserSerializer(read_only=True)
     image = Base64ImageField(required=True)
-    tags = serializers.PrimaryKeyRelatedField(
-        many=True,
-        required=True,
-        queryset=Tag.objects.all()
+    tags = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=True
     )
     ingredients = WriteIngredientRecipeSerializer(
         many=True,
@@ -207,19 +234,34 @@ class RecordRecipeSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 'Поле ingredients должно быть заполнено'
             )
-        list_id = []
-        for part_value in value:
-            if Ingredient.objects.filter(
-                id=part_value['id']
-            ).exists() is False or part_value['amount'] < 1:
-                raise serializers.ValidationError(
-                    'Некорректное поле ingredients/amount'
-                )
-            list_id.append(part_value['id'])
-        if len(list_id) != len(set(list_id)):
-            raise serializers.ValidationError(
-                'Добавление повторяющихся ingredients запрещено'
+        list_id = [part_value['id'] for part_value in value]
+        ingredients = self.context.get('ingredient_map')
+        if ingredients is None:
+            ingredients = Ingredient.objects.in_bulk(list_id)
+        errors = []
+        missing_id = [
+            ingredient_id for ingredient_id in list_id
+            if ingredient_id not in ingredients
+        ]
+        if missing_id:
+            errors.append(
+                f'Несуществующие ingredients: {util_format_ids(missing_id)}'
             )
+        invalid_amount_id = [
+            part_value['id'] for part_value in value
+            if part_value['amount'] < 1
+        ]
+        if invalid_amount_id:
+            errors.append(
+                'Некорректное поле amount у ingredients: '
+                f'{util_format_ids(invalid_amount_id)}'
+            )
+        if len(list_id) != len(set(list_id)):
+            errors.append('Добавление повторяющихся ingredients запрещено')
+        if errors:
+            raise serializers.ValidationError(errors)
+        for part_value in value:
+            part_value['ingredient'] = ingredients[part_value['id']]
         return value
 
     def validate_tags(self, value):
@@ -227,11 +269,20 @@ class RecordRecipeSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 'Поле tags должно быть заполнено'
             )
-        if len(value) != len(set(value)):
-            raise serializers.ValidationError(
-                'Добавление повторяющихся tags запрещено'
+        tags = self.context.get('tag_map')
+        if tags is None:
+            tags = Tag.objects.in_bulk(value)
+        errors = []
+        missing_id = [tag_id for tag_id in value if tag_id not in tags]
+        if missing_id:
+            errors.append(
+                f'Несуществующие tags: {util_format_ids(missing_id)}'
             )
-        return value
+        if len(value) != len(set(value)):
+            errors.append('Добавление повторяющихся tags запрещено')
+        if errors:
+            raise serializers.ValidationError(errors)
+        return [tags[tag_id] for tag_id in value]
 
     def validate_cooking_time(self, value):
         if value < 1:
@@ -259,53 +310,88 @@ class RecordRecipeSerializer(serializers.ModelSerializer):
             dict.pop(validated_data, 'tags')
         )
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients, tags = self.split_validated_data(validated_data)
         recipe = Recipe.objects.create(**validated_data)
         IngredientRecipe.objects.bulk_create(
             IngredientRecipe(
-                ingredient_id=ingredient.get("id"),
+                ingredient=ingredient['ingredient'],
                 recipe=recipe,
-                amount=ingredient.get("amount")
+                amount=ingredient['amount']
             ) for ingredient in ingredients
         )
         TagRecipe.objects.bulk_create(
-            TagRecipe(
-                tag=get_object_or_404(Tag, id=tag.id),
-                recipe=recipe
-            )for tag in tags
+            TagRecipe(tag=tag, recipe=recipe) for tag in tags
         )
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients, tags = self.split_validated_data(validated_data)
         super().update(instance, validated_data)
-        IngredientRecipe.objects.filter(
-            recipe=instance.id
-        ).delete()
+        self.update_ingredients(instance, ingredients)
+        self.update_tags(instance, tags)
+        return instance
+
+    def update_ingredients(self, instance, ingredients):
+        new_amounts = {
+            ingredient['ingredient'].id: ingredient['amount']
+            for ingredient in ingredients
+        }
+        old_rows = {
+            row.ingredient_id: row
+            for row in IngredientRecipe.objects.filter(
+                recipe=instance
+            ).only('id', 'ingredient_id', 'amount')
+        }
+        removed_id = [
+            row.id for ingredient_id, row in old_rows.items()
+            if ingredient_id not in new_amounts
+        ]
+        if removed_id:
+            IngredientRecipe.objects.filter(id__in=removed_id).delete()
+        changed_rows = []
+        for ingredient_id, row in old_rows.items():
+            amount = new_amounts.get(ingredient_id)
+            if amount is not None and amount != row.amount:
+                row.amount = amount
+                changed_rows.append(row)
+        if changed_rows:
+            IngredientRecipe.objects.bulk_update(changed_rows, ('amount',))
         IngredientRecipe.objects.bulk_create(
             IngredientRecipe(
-                ingredient_id=ingredient.get("id"),
-                recipe_id=instance.id,
-                amount=ingredient.get("amount")
+                ingredient=ingredient['ingredient'],
+                recipe=instance,
+                amount=ingredient['amount']
             ) for ingredient in ingredients
+            if ingredient['ingredient'].id not in old_rows
         )
-        old_tags = set(instance.tags.values_list('id', flat=True))
-        new_tags = set(tag.id for tag in tags)
-        TagRecipe.objects.filter(
-            recipe=instance.id,
-            tag__in=old_tags - new_tags
-        ).delete()
+
+    def update_tags(self, instance, tags):
+        new_tags = {tag.id: tag for tag in tags}
+        old_tags = set(TagRecipe.objects.filter(
+            recipe=instance
+        ).values_list('tag_id', flat=True))
+        if old_tags - new_tags.keys():
+            TagRecipe.objects.filter(
+                recipe=instance,
+                tag__in=old_tags - new_tags.keys()
+            ).delete()
         TagRecipe.objects.bulk_create(
-            TagRecipe(
-                tag=get_object_or_404(Tag, id=tag),
-                recipe=instance
-            ) for tag in (new_tags - old_tags)
+            TagRecipe(tag=tag, recipe=instance)
+            for tag_id, tag in new_tags.items()
+            if tag_id not in old_tags
         )
-        return instance
 
     def to_representation(self, value):
-        return ReadRecipeSerializer(instance=value, context=self.context).data
+        user = self.context.get('request').user
+        return ReadRecipeSerializer(
+            instance=Recipe.objects.with_user_flags(
+                user
+            ).with_related(user).get(pk=value.pk),
+            context=self.context
+        ).data
 
 
 class FavoriteSerializer(ShoppingCartFavorite):
@@ -313,11 +399,6 @@ class FavoriteSerializer(ShoppingCartFavorite):
     class Meta(ShoppingCartFavorite.Meta):
         model = Favorite
 
-    def validate(self, data):
-        return util_validate_recipe_subscriptions(self, data, Favorite)
-
 
 class ShoppingCartSerializer(ShoppingCartFavorite):
-
-    def validate(self, data):
-        return util_validate_recipe_subscriptions(self, data, ShoppingCart)
+    pass
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.utils import baseconv
+
+from recipes.models import Recipe
+from .lru import ExpiringLRUCache
+
+SHORT_LINK_ALPHABET = frozenset(baseconv.BASE64_ALPHABET)
+
+
+class RecipeIdCache(ExpiringLRUCache):
+
+    def __init__(self, size, ttl, negative_ttl):
+        super().__init__(size, ttl)
+        self.negative_ttl = negative_ttl
+
+    def exists(self, recipe_id):
+        exists = self.get(recipe_id)
+        if exists is None:
+            exists = Recipe.objects.filter(id=recipe_id).exists()
+            self.set(recipe_id, exists, None if exists else self.negative_ttl)
+        return exists
+
+
+recipe_id_cache = RecipeIdCache(
+    size=settings.SHORT_LINK_CACHE_SIZE,
+    ttl=settings.SHORT_LINK_CACHE_TTL,
+    negative_ttl=settings.SHORT_LINK_NEGATIVE_TTL
+)
@@ -0,0 +1,79 @@
+from django.contrib.auth import get_user_model, user_logged_out
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from recipes.models import (
+    Ingredient, IngredientRecipe, Recipe, Tag, TagRecipe
+)
+from .authentication import token_cache
+from .cache import (
+    bump_catalog_version, bump_recipes_generation, bump_token_version
+)
+from .pantry import pantry_index
+from .search import ingredient_index
+from .shortlinks import recipe_id_cache
+
+User = get_user_model()
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredient_index(**kwargs):
+    ingredient_index.invalidate()
+
+
+@receiver((post_save, post_delete), sender=Tag)
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_catalog_cache(**kwargs):
+    bump_catalog_version()
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver((post_save, post_delete), sender=TagRecipe)
+@receiver((post_save, post_delete), sender=IngredientRecipe)
+def invalidate_recipes_cache(**kwargs):
+    transaction.on_commit(bump_recipes_generation)
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def invalidate_recipe_id_cache(instance, **kwargs):
+    recipe_id_cache.discard(instance.id)
+
+
+@receiver(post_save, sender=Recipe)
+def update_pantry_index(instance, **kwargs):
+    recipe_id = instance.id
+    transaction.on_commit(lambda: pantry_index.update_recipe(recipe_id))
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_from_pantry_index(instance, **kwargs):
+    recipe_id = instance.id
+    transaction.on_commit(lambda: pantry_index.remove_recipe(recipe_id))
+
+
+def revoke_tokens(keys):
+    def bump_versions():
+        for key in keys:
+            bump_token_version(key)
+
+    for key in keys:
+        token_cache.discard(key)
+    transaction.on_commit(bump_versions)
+
+
+@receiver((post_save, post_delete), sender=Token)
+def invalidate_token_cache(instance, **kwargs):
+    revoke_tokens([instance.key])
+
+
+@receiver((post_save, post_delete), sender=User)
+@receiver(user_logged_out)
+def invalidate_user_tokens(sender, **kwargs):
+    user = kwargs.get('instance') or kwargs.get('user')
+    if user is None or user.pk is None:
+        return
+    revoke_tokens(list(Token.objects.filter(user=user.pk).values_list(
+        'key', flat=True
+    )))
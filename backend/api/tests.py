@@ -0,0 +1,1835 @@
+import base64
+import os
+import io
+import json
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock, skipIf
+from urllib.parse import urlparse
+
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import CommandError, call_command
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import connection
+from django.db.models import F
+from django.test import override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+import psycopg2
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import (
+    APIClient, APITestCase, APITransactionTestCase
+)
+
+from .authentication import token_cache
+from . import cache as api_cache
+from .cache import get_recipes_cache_stats, recipes_cache_stats
+from .fields import BASE64_CHUNK_SIZE, Base64ImageField
+from .pantry import pantry_index
+from .search import ingredient_index
+from .shortlinks import recipe_id_cache
+from backend.asgi import application
+from backend.postgresql_pool import pool
+from recipes.models import (
+    Favorite, Ingredient, IngredientRecipe, Recipe, ShoppingCart, Subscribe,
+    Tag, TagRecipe
+)
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+TEST_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
+def tearDownModule():
+    shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+
+def get_image(size=(1, 1), noise=False):
+    buffer = io.BytesIO()
+    if noise:
+        image = Image.frombytes('RGB', size, os.urandom(size[0] * size[1] * 3))
+    else:
+        image = Image.new('RGB', size)
+    image.save(buffer, 'PNG')
+    return 'data:image/png;base64,' + base64.b64encode(
+        buffer.getvalue()
+    ).decode()
+
+
+class APITestMixin:
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        recipe_id_cache.clear()
+        ingredient_index.invalidate()
+        pantry_index.invalidate()
+        recipes_cache_stats.clear()
+
+    @staticmethod
+    def create_user(name):
+        return User.objects.create_user(
+            email=f'{name}@example.com', password='password',
+            username=name, first_name='Имя', last_name='Фамилия'
+        )
+
+    @staticmethod
+    def get_client(user):
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION='Token ' + Token.objects.get_or_create(
+                user=user
+            )[0].key
+        )
+        return client
+
+    @staticmethod
+    def create_recipe(author, ingredients=(), tags=(), name='Блины'):
+        recipe = Recipe.objects.create(
+            author=author, image='recipes/images/test.png', name=name,
+            text='Смешать и пожарить', cooking_time=20
+        )
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(recipe=recipe, ingredient=ingredient, amount=10)
+            for ingredient in ingredients
+        )
+        TagRecipe.objects.bulk_create(
+            TagRecipe(recipe=recipe, tag=tag) for tag in tags
+        )
+        return recipe
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, CACHES=TEST_CACHES)
+class BaseAPITestCase(APITestMixin, APITestCase):
+    pass
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, CACHES=TEST_CACHES)
+class BaseAPITransactionTestCase(APITestMixin, APITransactionTestCase):
+    pass
+
+
+class RecipeFlagsTest(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user('user')
+        self.client = self.get_client(self.user)
+        author = self.create_user('author')
+        self.favorite = self.create_recipe(author, name='Избранное')
+        self.in_cart = self.create_recipe(author, name='В покупках')
+        self.plain = self.create_recipe(author, name='Обычный')
+        Favorite.objects.create(user=self.user, recipe=self.favorite)
+        ShoppingCart.objects.create(user=self.user, recipe=self.in_cart)
+
+    def get_flags(self, client, path='/api/recipes/'):
+        return {
+            recipe['id']: (
+                recipe['is_favorited'], recipe['is_in_shopping_cart']
+            )
+            for recipe in client.get(path).json()['results']
+        }
+
+    def test_flags_for_user(self):
+        self.assertEqual(self.get_flags(self.client), {
+            self.favorite.id: (True, False),
+            self.in_cart.id: (False, True),
+            self.plain.id: (False, False),
+        })
+
+    def test_flags_for_anonymous_user(self):
+        self.assertEqual(set(self.get_flags(APIClient()).values()), {
+            (False, False)
+        })
+
+    def test_flags_filters(self):
+        self.assertEqual(
+            list(self.get_flags(
+                self.client, '/api/recipes/?is_favorited=1'
+            )),
+            [self.favorite.id]
+        )
+        self.assertEqual(
+            list(self.get_flags(
+                self.client, '/api/recipes/?is_in_shopping_cart=1'
+            )),
+            [self.in_cart.id]
+        )
+
+    def test_flags_add_no_queries_per_recipe(self):
+        self.client.get('/api/recipes/')
+        with self.assertNumQueries(5):
+            self.client.get('/api/recipes/')
+        for _ in range(5):
+            Favorite.objects.create(
+                user=self.user, recipe=self.create_recipe(self.user)
+            )
+        with self.assertNumQueries(5):
+            self.client.get('/api/recipes/')
+
+
+class RecipeEagerLoadingTest(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user('user')
+        self.client = self.get_client(self.user)
+        self.tags = [
+            Tag.objects.create(name=name, slug=slug)
+            for name, slug in (('Завтрак', 'breakfast'), ('Обед', 'lunch'))
+        ]
+        self.ingredients = [
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('Мука', 'Сахар', 'Соль')
+        ]
+        self.author = self.create_user('author')
+        Subscribe.objects.create(user=self.user, owner=self.author)
+        self.recipe = self.create_recipe(
+            self.author, self.ingredients[:2], self.tags
+        )
+
+    def add_recipes(self, count):
+        for number in range(count):
+            self.create_recipe(
+                self.create_user(f'other{number}'),
+                self.ingredients[number % 3:],
+                self.tags[number % 2:]
+            )
+
+    def test_retrieve(self):
+        self.client.get('/api/users/me/')
+        with self.assertNumQueries(4):
+            response = self.client.get(f'/api/recipes/{self.recipe.id}/')
+        data = response.json()
+        self.assertTrue(data['author']['is_subscribed'])
+        self.assertEqual(
+            [tag['slug'] for tag in data['tags']], ['breakfast', 'lunch']
+        )
+        self.assertEqual(
+            sorted(
+                (ingredient['name'], ingredient['amount'],
+                 ingredient['measurement_unit'])
+                for ingredient in data['ingredients']
+            ),
+            [('Мука', 10, 'г'), ('Сахар', 10, 'г')]
+        )
+
+    def test_list_queries_do_not_grow(self):
+        self.client.get('/api/recipes/')
+        with self.assertNumQueries(5):
+            self.client.get('/api/recipes/')
+        self.add_recipes(5)
+        with self.assertNumQueries(5):
+            response = self.client.get('/api/recipes/')
+        self.assertEqual(len(response.json()['results']), 6)
+        subscribed = {
+            recipe['author']['id']: recipe['author']['is_subscribed']
+            for recipe in response.json()['results']
+        }
+        self.assertTrue(subscribed.pop(self.author.id))
+        self.assertFalse(any(subscribed.values()))
+
+
+class IngredientSearchTest(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        for name in ('Сахарная пудра', 'Сахар', 'Тростниковый сахар', 'Соль'):
+            Ingredient.objects.create(name=name, measurement_unit='г')
+
+    def search(self, name):
+        return [
+            ingredient['name']
+            for ingredient in self.client.get(
+                '/api/ingredients/', {'name': name}
+            ).json()
+        ]
+
+    def test_prefix_matches_come_first(self):
+        self.assertEqual(
+            self.search('сах'),
+            ['Сахар', 'Сахарная пудра', 'Тростниковый сахар']
+        )
+        self.assertEqual(self.search('пудр'), ['Сахарная пудра'])
+        self.assertEqual(self.search('перец'), [])
+
+    def test_limit(self):
+        with mock.patch.object(ingredient_index, 'limit', 2):
+            self.assertEqual(self.search('сах'), ['Сахар', 'Сахарная пудра'])
+
+    def test_index_is_reused_between_queries(self):
+        salt = Ingredient.objects.get(name='Соль')
+        ingredient_index.search('сах')
+        with self.assertNumQueries(0):
+            result = ingredient_index.search('со')
+        self.assertEqual(result, [
+            {'id': salt.id, 'name': 'Соль', 'measurement_unit': 'г'}
+        ])
+
+    def test_new_ingredient_invalidates_index(self):
+        self.assertEqual(self.search('пер'), [])
+        Ingredient.objects.create(name='Перец', measurement_unit='г')
+        self.assertEqual(self.search('пер'), ['Перец'])
+
+
+class ShoppingListDownloadTest(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user('user')
+        self.client = self.get_client(self.user)
+        flour = Ingredient.objects.create(name='Мука', measurement_unit='г')
+        salt = Ingredient.objects.create(name='Соль', measurement_unit='г')
+        for ingredients in ((flour, salt), (flour,)):
+            ShoppingCart.objects.create(
+                user=self.user,
+                recipe=self.create_recipe(self.user, ingredients)
+            )
+        self.create_recipe(self.user, (salt,))
+
+    def download(self, **params):
+        response = self.client.get(
+            '/api/recipes/download_shopping_cart/', params
+        )
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_txt(self):
+        response, content = self.download()
+        self.assertEqual(response['Content-Type'], 'text/plain; charset=utf-8')
+        self.assertEqual(
+            content, 'Список покупок:\nМука: 20г\nСоль: 10г\n'
+        )
+
+    def test_csv(self):
+        response, content = self.download(format='csv')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(content.splitlines(), [
+            'name,amount,measurement_unit', 'Мука,20,г', 'Соль,10,г'
+        ])
+
+    def test_json(self):
+        response, content = self.download(format='json')
+        self.assertIn('exported_data.json', response['Content-Disposition'])
+        self.assertEqual(json.loads(content), [
+            {'name': 'Мука', 'amount': 20, 'measurement_unit': 'г'},
+            {'name': 'Соль', 'amount': 10, 'measurement_unit': 'г'},
+        ])
+
+    def test_unknown_format(self):
+        response = self.client.get(
+            '/api/recipes/download_shopping_cart/', {'format': 'pdf'}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('format', response.json())
+
+    def test_anonymous_user(self):
+        self.assertEqual(
+            APIClient().get(
+                '/api/recipes/download_shopping_cart/'
+            ).status_code,
+            401
+        )
+
+
+class LoadIngredientsTest(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        Ingredient.objects.create(name='Соль', measurement_unit='г')
+
+    def write(self, name, content):
+        path = os.path.join(MEDIA_ROOT, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def load(self, path, *args):
+        stdout = io.StringIO()
+        call_command('load_ingredients', path, *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_csv_is_idempotent(self):
+        path = self.write(
+            'ingredients.csv', 'Мука,г\nСоль,г\n\nМука,кг\nСахар, г\n'
+        )
+        self.assertIn('Прочитано 4, добавлено 2', self.load(
+            path, '--batch-size', '1'
+        ))
+        self.assertIn('Прочитано 4, добавлено 0', self.load(path))
+        self.assertEqual(
+            dict(Ingredient.objects.values_list('name', 'measurement_unit')),
+            {'Мука': 'г', 'Соль': 'г', 'Сахар': 'г'}
+        )
+
+    def test_json_is_read_in_chunks(self):
+        path = self.write('ingredients.json', json.dumps([
+            {'name': f'Ингредиент {number}', 'measurement_unit': 'г'}
+            for number in range(10)
+        ], ensure_ascii=False))
+        with mock.patch(
+            'recipes.management.commands.load_ingredients.READ_CHUNK_SIZE', 7
+        ):
+            self.load(path)
+        self.assertEqual(Ingredient.objects.count(), 11)
+
+    def test_invalid_files(self):
+        with self.assertRaisesMessage(CommandError, 'Некорректный JSON'):
+            self.load(self.write('broken.json', '[{"name": "Мука"'))
+        with self.assertRaisesMessage(CommandError, '.csv и .json'):
+            self.load(self.write('ingredients.txt', 'Мука,г'))
+        self.assertEqual(Ingredient.objects.count(), 1)
+
+
+class CursorPaginationTest(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user('user')
+        self.client = self.get_client(self.user)
+        self.recipes = [
+            self.create_recipe(self.user, name=f'Рецепт {number}')
+            for number in range(7)
+        ]
+
+    def walk(self, path, params):
+        ids = []
+        url = path
+        while url:
+            data = self.client.get(url, params).json()
+            self.assertNotIn('count', data)
+            ids.extend(item['id'] for item in data['results'])
+            url, params = data['next'], None
+        return ids
+
+    def test_recipes_cursor(self):
+        self.assertEqual(
+            self.walk('/api/recipes/', {'pagination': 'cursor', 'limit': 3}),
+            [recipe.id for recipe in self.recipes]
+        )
+
+    def test_users_cursor(self):
+        users = [self.user] + [
+            self.create_user(f'user{number}') for number in range(4)
+        ]
+        self.assertEqual(
+            self.walk('/api/users/', {'pagination': 'cursor', 'limit': 2}),
+            [user.id for user in users]
+        )
+
+    def test_page_number_by_default(self):
+        data = self.client.get('/api/recipes/', {'limit': 3}).json()
+        self.assertEqual(data['count'], 7)
+        self.assertIn('page=2', data['next'])
+
+    def test_deep_page_skips_count(self):
+        params = {'pagination': 'cursor', 'limit': 2}
+        self.client.get('/api/recipes/', params)
+        with self.assertNumQueries(4):
+            data = self.client.get('/api/recipes/', params).json()
+        with self.assertNumQueries(4):
+            self.client.get(data['next'])
+        with self.assertNumQueries(5):
+            self.client.get('/api/recipes/', {'limit': 2, 'page': 3})
+
+    def test_seed_recipes(self):
+        with self.assertRaisesMessage(CommandError, 'load_ingredients'):
+            call_command('seed_recipes', stdout=io.StringIO())
+        for name in ('Мука', 'Сахар', 'Соль'):
+            Ingredient.objects.create(name=name, measurement_unit='г')
+        call_command(
+            'seed_recipes', '--users', '4', '--recipes', '10',
+            '--ingredients-per-recipe', '2', '--favorites-per-user', '3',
+            '--subscriptions-per-user', '2', '--batch-size', '3',
+            stdout=io.StringIO()
+        )
+        self.assertEqual(Recipe.objects.count(), 17)
+        seeded = Recipe.objects.exclude(author=self.user)
+        self.assertEqual(
+            IngredientRecipe.objects.filter(recipe__in=seeded).count(), 20
+        )
+        self.assertEqual(Favorite.objects.count(), 12)
+        self.assertFalse(Subscribe.objects.filter(
+            user=F('owner')
+        ).exists())
+        recipe = seeded.order_by('-favorites_count').first()
+        self.assertEqual(recipe.favorites_count, recipe.favorites.count())
+        self.assertEqual(
+            self.client.get(
+                '/api/recipes/', {'search': 'тестовый'}
+            ).json()['count'],
+            10
+        )
+
+    def test_benchmark_pagination(self):
+        stdout = io.StringIO()
+        call_command(
+            'benchmark_pagination', '--page', '3', '--limit', '2',
+            '--repeat', '2', stdout=stdout
+        )
+        lines = stdout.getvalue().splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[-1].lstrip().startswith('cursor страница'))
+        with self.assertRaisesMessage(CommandError, 'seed_recipes'):
+            call_command(
+                'benchmark_pagination', '--page', '10', '--limit', '2',
+                '--repeat', '1', stdout=io.StringIO()
+            )
+
+
+class ExplainEndpointsTest(BaseAPITestCase):
+
+    def explain(self, *args):
+        stdout = io.StringIO()
+        call_command('explain_endpoints', *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def get_indexes(self):
+        with connection.cursor() as cursor:
+            return set(connection.introspection.get_constraints(
+                cursor, Recipe._meta.db_table
+            ))
+
+    def test_without_data(self):
+        with self.assertRaisesMessage(CommandError, 'seed_recipes'):
+            self.explain()
+
+    def create_data(self):
+        user = self.create_user('user')
+        author = self.create_user('author')
+        Subscribe.objects.create(user=user, owner=author)
+        ShoppingCart.objects.create(
+            user=user, recipe=self.create_recipe(author)
+        )
+
+    def test_plans(self):
+        self.create_data()
+        plans = self.explain()
+        self.assertEqual(plans.count('=== GET '), 6)
+        self.assertIn('recipe_author_created_at_idx', plans)
+
+    def test_plans_without_indexes(self):
+        # SQLite кэширует подготовленные запросы соединения: лишний
+        # пользователь меняет id в тексте запросов относительно test_plans.
+        self.create_user('other')
+        self.create_data()
+        indexes = self.get_indexes()
+        plans = self.explain('--without-indexes')
+        self.assertEqual(plans.count('=== GET '), 6)
+        self.assertNotIn('recipe_author_created_at_idx', plans)
+        self.assertEqual(self.get_indexes(), indexes)
+        self.assertTrue(Recipe.objects.exists())
+
+
+class RecipeValidationTest(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user('user')
+        self.client = self.get_client(self.user)
+        self.tags = [
+            Tag.objects.create(name=name, slug=slug)
+            for name, slug in (('Завтрак', 'breakfast'), ('Обед', 'lunch'))
+        ]
+        self.ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г'
+            )
+            for number in range(10)
+        ]
+
+    def get_data(self, ingredients, tags=None):
+        return {
+            'ingredients': [
+                {'id': ingredient.id, 'amount': 5}
+                for ingredient in ingredients
+            ],
+            'tags': [tag.id for tag in tags or self.tags],
+            'image': get_image(),
+            'name': 'Блины',
+            'text': 'Смешать и пожарить',
+            'cooking_time': 20,
+        }
+
+    def create(self, data):
+        return self.client.post('/api/recipes/', data, format='json')
+
+    def test_create_queries_do_not_grow(self):
+        counts = []
+        for size in (1, 10):
+            with CaptureQueriesContext(connection) as context:
+                response = self.create(self.get_data(
+                    self.ingredients[:size]
+                ))
+            self.assertEqual(response.status_code, 201, response.content)
+            self.assertEqual(len(response.json()['ingredients']), size)
+            counts.append(len(context))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_validation_queries_do_not_grow(self):
+        data = self.get_data(self.ingredients)
+        data['cooking_time'] = 0
+        with self.assertNumQueries(3):
+            response = self.create(data)
+        self.assertEqual(response.status_code, 400)
+
+    def test_errors_list_every_problem(self):
+        data = self.get_data(self.ingredients[:2])
+        data['ingredients'] += [
+            {'id': self.ingredients[0].id, 'amount': 0},
+            {'id': 999, 'amount': 5},
+        ]
+        data['tags'] += [self.tags[0].id, 998]
+        response = self.create(data)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['ingredients'], [
+            'Несуществующие ingredients: 999',
+            f'Некорректное поле amount у ingredients: '
+            f'{self.ingredients[0].id}',
+            'Добавление повторяющихся ingredients запрещено',
+        ])
+        self.assertEqual(response.json()['tags'], [
+            'Несуществующие tags: 998',
+            'Добавление повторяющихся tags запрещено',
+        ])
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_empty_lists(self):
+        data = self.get_data(())
+        data['tags'] = []
+        response = self.create(data)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {
+            'ingredients': ['Поле ingredients должно быть заполнено'],
+            'tags': ['Поле tags должно быть заполнено'],
+        })
+
+
+class RecipeUpdateTest(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user('user')
+        self.client = self.get_client(self.user)
+        self.tags = [
+            Tag.objects.create(name=name, slug=slug)
+            for name, slug in (('Завтрак', 'breakfast'), ('Обед', 'lunch'))
+        ]
+        self.ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г'
+            )
+            for number in range(4)
+        ]
+        self.recipe = self.create_recipe(
+            self.user, self.ingredients[:3], self.tags[:1]
+        )
+        self.path = f'/api/recipes/{self.recipe.id}/'
+
+    def patch(self, amounts, tags):
+        return self.client.patch(self.path, {
+            'ingredients': [
+                {'id': self.ingredients[number].id, 'amount': amount}
+                for number, amount in amounts.items()
+            ],
+            'tags': [self.tags[number].id for number in tags],
+        }, format='json')
+
+    def get_rows(self):
+        return dict(IngredientRecipe.objects.filter(
+            recipe=self.recipe
+        ).values_list('ingredient_id', 'id'))
+
+    def test_diff(self):
+        rows = self.get_rows()
+        response = self.patch({0: 10, 1: 25, 3: 5}, (1,))
+        self.assertEqual(response.status_code, 200, response.content)
+        new_rows = self.get_rows()
+        self.assertEqual(
+            new_rows[self.ingredients[0].id], rows[self.ingredients[0].id]
+        )
+        self.assertEqual(
+            new_rows[self.ingredients[1].id], rows[self.ingredients[1].id]
+        )
+        self.assertNotIn(self.ingredients[2].id, new_rows)
+        self.assertEqual(
+            sorted(
+                (ingredient['id'], ingredient['amount'])
+                for ingredient in response.json()['ingredients']
+            ),
+            [(self.ingredients[0].id, 10), (self.ingredients[1].id, 25),
+             (self.ingredients[3].id, 5)]
+        )
+        self.assertEqual(
+            [tag['id'] for tag in response.json()['tags']], [self.tags[1].id]
+        )
+
+    def test_queries_do_not_grow(self):
+        counts = []
+        for size in (2, 4):
+            self.recipe = self.create_recipe(
+                self.user, self.ingredients[:size], self.tags[:1]
+            )
+            self.path = f'/api/recipes/{self.recipe.id}/'
+            with CaptureQueriesContext(connection) as context:
+                self.patch({number: 20 for number in range(size)}, (1,))
+            counts.append(len(context))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_unchanged_relations_are_not_written(self):
+        with CaptureQueriesContext(connection) as context:
+            self.patch({0: 10, 1: 10, 2: 10}, (0,))
+        writes = [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))
+            and ('recipes_ingredientrecipe' in query['sql']
+                 or 'recipes_tagrecipe' in query['sql'])
+        ]
+        self.assertEqual(writes, [])
+
+    def test_failed_update_is_rolled_back(self):
+        rows = self.get_rows()
+        with mock.patch.object(
+            TagRecipe.objects, 'bulk_create', side_effect=RuntimeError
+        ):
+            with self.assertRaises(RuntimeError):
+                self.patch({0: 50, 3: 5}, (1,))
+        self.assertEqual(self.get_rows(), rows)
+        self.assertEqual(
+            set(IngredientRecipe.objects.filter(
+                recipe=self.recipe
+            ).values_list('amount', flat=True)),
+            {10}
+        )
+        self.assertEqual(
+            list(TagRecipe.objects.filter(
+                recipe=self.recipe
+            ).values_list('tag', flat=True)),
+            [self.tags[0].id]
+        )
+
+
+class ImportRecipesTest(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.author = self.create_user('author')
+        self.tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+        self.flour = Ingredient.objects.create(
+            name='Мука', measurement_unit='г'
+        )
+
+    def get_line(self, name, **fields):
+        return json.dumps({
+            'ingredients': [{'id': self.flour.id, 'amount': 100}],
+            'tags': [self.tag.id],
+            'image': get_image(),
+            'name': name,
+            'text': 'Смешать и пожарить',
+            'cooking_time': 20,
+            **fields
+        }, ensure_ascii=False)
+
+    def run_import(self, lines, *args):
+        path = os.path.join(MEDIA_ROOT, 'recipes.ndjson')
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write('\n'.join(lines) + '\n')
+        report = io.StringIO()
+        with mock.patch('sys.stdout', report):
+            call_command(
+                'import_recipes', path, '--author', self.author.email,
+                *args, stderr=io.StringIO()
+            )
+        return [json.loads(line) for line in report.getvalue().splitlines()]
+
+    def test_report(self):
+        report = self.run_import([
+            self.get_line('Блины'),
+            '{"name": ',
+            '',
+            self.get_line('Оладьи', tags=[999]),
+            self.get_line('Сырники'),
+        ], '--batch-size', '2')
+        report.sort(key=lambda line: line['line'])
+        self.assertEqual(
+            [(line['line'], line['status']) for line in report],
+            [(1, 'ok'), (2, 'error'), (4, 'error'), (5, 'ok')]
+        )
+        self.assertEqual(report[2]['errors'], {
+            'tags': ['Несуществующие tags: 999']
+        })
+        self.assertEqual(
+            sorted(Recipe.objects.values_list('name', flat=True)),
+            ['Блины', 'Сырники']
+        )
+        recipe = Recipe.objects.get(id=report[0]['id'])
+        self.assertEqual(recipe.author, self.author)
+        self.assertEqual(
+            list(recipe.ingredients_recipes.values_list(
+                'ingredient', 'amount'
+            )),
+            [(self.flour.id, 100)]
+        )
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.recipes_count, 2)
+
+    @skipUnlessDBFeature('can_return_rows_from_bulk_insert')
+    def test_queries_do_not_grow(self):
+        counts = []
+        for size in (2, 6):
+            with CaptureQueriesContext(connection) as context:
+                self.run_import([
+                    self.get_line(f'Рецепт {number}')
+                    for number in range(size)
+                ], '--batch-size', '10')
+            counts.append(len(context))
+        self.assertEqual(Recipe.objects.count(), 8)
+        self.assertEqual(counts[0], counts[1])
+
+    def test_unknown_author(self):
+        with self.assertRaisesMessage(CommandError, 'не найден'):
+            call_command(
+                'import_recipes', '-', '--author', 'nobody@example.com'
+            )
+
+
+class FavoriteShoppingCartTest(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user('user')
+        self.client = self.get_client(self.user)
+        self.recipe = self.create_recipe(self.create_user('author'))
+
+    def test_toggle(self):
+        for action, model, counter in (
+            ('favorite', Favorite, 'favorites_count'),
+            ('shopping_cart', ShoppingCart, 'in_carts_count'),
+        ):
+            with self.subTest(action=action):
+                path = f'/api/recipes/{self.recipe.id}/{action}/'
+                response = self.client.post(path)
+                self.assertEqual(response.status_code, 201)
+                self.assertEqual(response.json()['id'], self.recipe.id)
+                self.assertEqual(response.json()['cooking_time'], 20)
+                self.assertEqual(self.client.post(path).status_code, 400)
+                self.recipe.refresh_from_db()
+                self.assertEqual(getattr(self.recipe, counter), 1)
+                self.assertEqual(self.client.delete(path).status_code, 204)
+                self.assertEqual(self.client.delete(path).status_code, 400)
+                self.recipe.refresh_from_db()
+                self.assertEqual(getattr(self.recipe, counter), 0)
+                self.assertFalse(model.objects.exists())
+
+    def test_unknown_recipe(self):
+        for action in ('favorite', 'shopping_cart'):
+            path = f'/api/recipes/{self.recipe.id + 1}/{action}/'
+            self.assertEqual(self.client.post(path).status_code, 404)
+            self.assertEqual(self.client.delete(path).status_code, 404)
+
+    def test_queries(self):
+        path = f'/api/recipes/{self.recipe.id}/favorite/'
+        with self.assertNumQueries(6):
+            self.client.post(path)
+        with self.assertNumQueries(5):
+            self.client.delete(path)
+
+
+class AdminTest(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_superuser(
+            email='admin@example.com', password='password',
+            username='admin', first_name='Имя', last_name='Фамилия'
+        )
+        self.client.force_login(self.admin)
+
+    def add_rows(self, count):
+        for _ in range(count):
+            number = User.objects.count()
+            author = self.create_user(f'author{number}')
+            ingredient = Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г'
+            )
+            recipe = self.create_recipe(author, (ingredient,))
+            Favorite.objects.create(user=self.admin, recipe=recipe)
+            ShoppingCart.objects.create(user=self.admin, recipe=recipe)
+            Subscribe.objects.create(user=self.admin, owner=author)
+
+    def get_query_counts(self):
+        counts = {}
+        for model in ('recipe', 'ingredient', 'subscribe', 'favorite',
+                      'shoppingcart'):
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(f'/admin/recipes/{model}/')
+            self.assertEqual(response.status_code, 200)
+            counts[model] = len(context)
+        return counts
+
+    def test_changelist_queries_do_not_grow(self):
+        self.add_rows(1)
+        counts = self.get_query_counts()
+        self.add_rows(5)
+        self.assertEqual(self.get_query_counts(), counts)
+
+    def test_estimated_count_skips_count_query(self):
+        self.add_rows(2)
+        with mock.patch(
+            'recipes.paginators.EstimatedCountPaginator.get_estimate',
+            return_value=10 ** 7
+        ):
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get('/admin/recipes/favorite/')
+        self.assertContains(response, '10000000')
+        self.assertFalse(any(
+            'COUNT(' in query['sql'] for query in context.captured_queries
+        ))
+
+    def test_author_autocomplete(self):
+        self.add_rows(1)
+        response = self.client.get('/admin/autocomplete/', {
+            'app_label': 'recipes', 'model_name': 'recipe',
+            'field_name': 'author', 'term': 'author'
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 1)
+
+    def test_delete_favorite_updates_counter(self):
+        self.add_rows(1)
+        favorite = Favorite.objects.get()
+        response = self.client.post('/admin/recipes/favorite/', {
+            'action': 'delete_selected', '_selected_action': [favorite.id],
+            'post': 'yes'
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Favorite.objects.exists())
+        favorite.recipe.refresh_from_db()
+        self.assertEqual(favorite.recipe.favorites_count, 0)
+
+
+class RecipeSearchTest(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user('user')
+        self.client = self.get_client(self.user)
+        self.tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+        self.in_text = Recipe.objects.create(
+            author=self.user, image='recipes/images/test.png',
+            name='Завтрак на скорую руку', text='Подать с блинами',
+            cooking_time=10
+        )
+        self.in_name = self.create_recipe(self.user, name='Блины с мясом')
+        self.other = self.create_recipe(
+            self.user, tags=(self.tag,), name='Сырники'
+        )
+
+    def search(self, **params):
+        return [
+            recipe['id'] for recipe in self.client.get(
+                '/api/recipes/', params
+            ).json()['results']
+        ]
+
+    def test_name_matches_rank_first(self):
+        self.assertEqual(
+            self.search(search='блин'), [self.in_name.id, self.in_text.id]
+        )
+
+    def test_ordering_param_overrides_rank(self):
+        self.assertEqual(
+            self.search(search='блин', ordering='created_at'),
+            [self.in_text.id, self.in_name.id]
+        )
+
+    def test_search_with_filters(self):
+        self.assertEqual(self.search(search='сырники', tags='breakfast'), [
+            self.other.id
+        ])
+        self.assertEqual(self.search(search='блины', tags='breakfast'), [])
+
+    def test_blank_and_punctuation(self):
+        self.assertEqual(len(self.search(search='  ')), 3)
+        self.assertEqual(self.search(search='!!!'), [])
+
+    def test_index_follows_changes(self):
+        self.other.name = 'Блинчики'
+        self.other.save()
+        self.assertIn(self.other.id, self.search(search='блинчики'))
+        self.in_name.delete()
+        self.assertEqual(self.search(search='мясом'), [])
+
+
+class FeedTest(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user('user')
+        self.client = self.get_client(self.user)
+        self.author = self.create_user('author')
+        self.old_recipes = [
+            self.create_recipe(self.author, name=f'Старый {number}')
+            for number in range(3)
+        ]
+
+    def get_feed(self, **params):
+        return [
+            recipe['id'] for recipe in self.client.get(
+                '/api/recipes/feed/', params
+            ).json()['results']
+        ]
+
+    def publish(self, author):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.create_recipe(author, name='Новый')
+
+    def test_subscribe_backfills_and_unsubscribe_trims(self):
+        path = f'/api/users/{self.author.id}/subscribe/'
+        self.assertEqual(self.get_feed(), [])
+        self.assertEqual(self.client.post(path).status_code, 201)
+        self.assertEqual(
+            self.get_feed(),
+            [recipe.id for recipe in reversed(self.old_recipes)]
+        )
+        self.assertEqual(self.client.delete(path).status_code, 204)
+        self.assertEqual(self.get_feed(), [])
+
+    @override_settings(FEED_FANOUT_BATCH_SIZE=2)
+    def test_new_recipe_fans_out_to_subscribers(self):
+        subscribers = [self.user] + [
+            self.create_user(f'reader{number}') for number in range(4)
+        ]
+        for subscriber in subscribers:
+            Subscribe.objects.create(user=subscriber, owner=self.author)
+        stranger = self.create_user('stranger')
+        recipe = self.publish(self.author)
+        self.assertEqual(self.get_feed()[0], recipe.id)
+        self.assertEqual(
+            set(recipe.feed_entries.values_list('user', flat=True)),
+            {subscriber.id for subscriber in subscribers}
+        )
+        self.publish(stranger)
+        self.assertEqual(len(self.get_feed()), 4)
+
+    def test_cursor_pages_and_queries(self):
+        Subscribe.objects.create(user=self.user, owner=self.author)
+        self.client.get('/api/recipes/feed/')
+        with self.assertNumQueries(4):
+            data = self.client.get('/api/recipes/feed/', {'limit': 2}).json()
+        for _ in range(4):
+            self.publish(self.author)
+        with self.assertNumQueries(4):
+            self.client.get(data['next'])
+        self.assertEqual(len(self.get_feed(limit=10)), 7)
+
+    def test_anonymous_user(self):
+        self.assertEqual(
+            APIClient().get('/api/recipes/feed/').status_code, 401
+        )
+
+
+class SimilarRecipesTest(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        author = self.create_user('author')
+        flour, eggs, milk, sugar, salt = (
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('Мука', 'Яйца', 'Молоко', 'Сахар', 'Соль')
+        )
+        tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+        self.salt = salt
+        self.pancakes = self.create_recipe(
+            author, (flour, eggs, milk), (tag,), 'Блины'
+        )
+        self.sweet = self.create_recipe(
+            author, (flour, eggs, milk, sugar), (tag,), 'Сладкие блины'
+        )
+        self.noodles = self.create_recipe(author, (flour, eggs), (), 'Лапша')
+        self.brine = self.create_recipe(author, (salt,), (), 'Рассол')
+
+    def build(self, *args):
+        stdout = io.StringIO()
+        call_command('build_similar_recipes', *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def get_similar(self, recipe):
+        return [
+            item['id'] for item in self.client.get(
+                f'/api/recipes/{recipe.id}/similar/'
+            ).json()
+        ]
+
+    def test_similar_ranking(self):
+        self.build('--workers', '1')
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                f'/api/recipes/{self.pancakes.id}/similar/'
+            )
+        self.assertEqual(
+            [item['id'] for item in response.json()],
+            [self.sweet.id, self.noodles.id]
+        )
+        self.assertEqual(
+            set(response.json()[0]), {'id', 'name', 'image', 'cooking_time'}
+        )
+        self.assertEqual(self.get_similar(self.brine), [])
+
+    def test_workers_give_same_result(self):
+        self.build('--workers', '2', '--chunk-size', '1')
+        self.assertEqual(
+            self.get_similar(self.pancakes), [self.sweet.id, self.noodles.id]
+        )
+
+    def test_incremental_run(self):
+        self.build('--workers', '1')
+        self.assertIn('Обновлено 0 рецептов', self.build('--workers', '1'))
+        IngredientRecipe.objects.create(
+            recipe=self.noodles, ingredient=self.salt, amount=5
+        )
+        self.noodles.save()
+        self.assertIn('Обновлено 1 рецептов', self.build('--workers', '1'))
+        self.assertEqual(self.get_similar(self.brine), [self.noodles.id])
+
+    def test_unknown_recipe(self):
+        self.assertEqual(
+            self.client.get(
+                f'/api/recipes/{self.brine.id + 1}/similar/'
+            ).status_code,
+            404
+        )
+
+
+class FakeConnection:
+
+    def __init__(self):
+        self.closed = 0
+        self.broken = False
+
+    def cursor(self):
+        if self.broken:
+            raise psycopg2.OperationalError
+        return mock.MagicMock()
+
+    def rollback(self):
+        pass
+
+
+class FakeThreadedConnectionPool:
+
+    def __init__(self, minconn, maxconn, **kwargs):
+        self.free = []
+
+    def getconn(self):
+        return self.free.pop() if self.free else FakeConnection()
+
+    def putconn(self, connection, close=False):
+        if close:
+            connection.closed = 1
+        else:
+            self.free.append(connection)
+
+
+@mock.patch.object(pool.pool, 'ThreadedConnectionPool',
+                   FakeThreadedConnectionPool)
+class ConnectionPoolTest(BaseAPITestCase):
+
+    def get_pool(self, **options):
+        return pool.ConnectionPool({}, **{
+            'size': 1,
+            'timeout': 0.05,
+            'max_lifetime': 60,
+            'health_check_interval': 30,
+            **options
+        })
+
+    def test_wait_timeout(self):
+        connections_pool = self.get_pool()
+        connection = connections_pool.getconn()
+        with self.assertRaises(pool.pool.PoolError):
+            connections_pool.getconn()
+        connections_pool.putconn(connection)
+        self.assertIs(connections_pool.getconn(), connection)
+        stats = connections_pool.get_stats()
+        self.assertEqual(
+            (stats['checkouts'], stats['waits'], stats['timeouts'],
+             stats['in_use']),
+            (2, 1, 1, 1)
+        )
+
+    def test_expired_connection_is_discarded(self):
+        connections_pool = self.get_pool(max_lifetime=0)
+        connection = connections_pool.getconn()
+        connections_pool.putconn(connection)
+        self.assertTrue(connection.closed)
+        self.assertIsNot(connections_pool.getconn(), connection)
+        self.assertEqual(connections_pool.get_stats()['discarded'], 1)
+
+    def test_broken_connection_is_replaced(self):
+        connections_pool = self.get_pool(health_check_interval=0)
+        connection = connections_pool.getconn()
+        connections_pool.putconn(connection)
+        connection.broken = True
+        self.assertIsNot(connections_pool.getconn(), connection)
+        self.assertTrue(connection.closed)
+
+    def test_pool_per_process(self):
+        params, options = {'dbname': 'test'}, {'SIZE': 2}
+        self.addCleanup(pool._pools.clear)
+        first = pool.get_pool('default', params, options)
+        self.assertIs(pool.get_pool('default', params, options), first)
+        with mock.patch('os.getpid', return_value=first.pid + 1):
+            second = pool.get_pool('default', params, options)
+            self.assertIsNot(second, first)
+            self.assertEqual(second.size, 2)
+            self.assertEqual(pool.get_pool_stats()['default']['size'], 2)
+
+    @skipIf(connection.vendor == 'postgresql', 'проверка для других СУБД')
+    def test_benchmark_needs_postgresql(self):
+        with self.assertRaisesMessage(CommandError, 'PostgreSQL'):
+            call_command('benchmark_db_connections', '--requests', '1')
+
+    def test_stats_endpoint_is_admin_only(self):
+        user = self.create_user('user')
+        self.assertEqual(
+            self.get_client(user).get('/api/pool_stats/').status_code, 403
+        )
+        user.is_staff = True
+        user.save()
+        response = self.get_client(user).get('/api/pool_stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), pool.get_pool_stats())
+
+
+class BenchmarkHttpTest(BaseAPITestCase):
+
+    def benchmark(self, statuses):
+        stdout = io.StringIO()
+        with mock.patch(
+            'requests.Session.get',
+            side_effect=lambda url, **kwargs: mock.Mock(
+                status_code=statuses[urlparse(url).path]
+            )
+        ) as session_get:
+            call_command(
+                'benchmark_http', 'http://localhost/api/recipes/',
+                'http://localhost/api/tags/', '--requests', '10',
+                '--warmup', '2', '--concurrency', '2', '--token', 'key',
+                stdout=stdout
+            )
+        self.assertEqual(session_get.call_count, 12)
+        return stdout.getvalue()
+
+    def test_report(self):
+        output = self.benchmark({'/api/recipes/': 200, '/api/tags/': 500})
+        self.assertIn('запросов/с', output)
+        self.assertIn('ошибок 5', output)
+
+    def test_all_requests_failed(self):
+        with self.assertRaisesMessage(CommandError, 'ошибкой'):
+            self.benchmark({'/api/recipes/': 503, '/api/tags/': 503})
+
+
+class CatalogCacheTest(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+        Ingredient.objects.create(name='Мука ржаная', measurement_unit='г')
+
+    def test_repeated_tags_list_skips_database(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/tags/')
+        with self.assertNumQueries(0):
+            cached = self.client.get('/api/tags/')
+        self.assertEqual(cached.content, response.content)
+        self.assertEqual(
+            self.client.get(
+                '/api/tags/', HTTP_IF_NONE_MATCH=cached['ETag']
+            ).status_code,
+            304
+        )
+
+    def test_tag_change_invalidates_cache(self):
+        self.client.get('/api/tags/')
+        Tag.objects.create(name='Обед', slug='lunch')
+        self.assertEqual(len(self.client.get('/api/tags/').json()), 2)
+
+    def test_retrieve_is_cached_with_headers(self):
+        path = f'/api/tags/{self.tag.id}/'
+        self.client.get(path)
+        with self.assertNumQueries(0):
+            response = self.client.get(path)
+        self.assertEqual(response.json()['slug'], 'breakfast')
+        self.assertEqual(
+            response['Cache-Control'],
+            f'public, max-age={settings.CATALOG_MAX_AGE}'
+        )
+        self.client.get(f'/api/tags/{self.tag.id + 1}/')
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/tags/{self.tag.id + 1}/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_query_order_shares_entry(self):
+        self.client.get('/api/ingredients/', {'name': 'мука', 'x': 1})
+        with self.assertNumQueries(0):
+            self.client.get('/api/ingredients/?x=1&name=мука')
+
+    def test_version_bump_from_other_worker(self):
+        self.client.get('/api/tags/')
+        api_cache.bump_catalog_version()
+        with self.assertNumQueries(1):
+            self.client.get('/api/tags/')
+
+    def test_ingredient_change_invalidates_search(self):
+        self.client.get('/api/ingredients/', {'name': 'мука'})
+        Ingredient.objects.create(name='Мука пшеничная', measurement_unit='г')
+        self.assertEqual(
+            len(self.client.get('/api/ingredients/', {'name': 'мука'}).json()),
+            2
+        )
+
+    def test_ingredient_search_key_with_spaces(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/ingredients/?name=мука ржаная')
+        with self.assertNumQueries(0):
+            cached = self.client.get('/api/ingredients/?name=мука ржаная')
+        self.assertEqual(cached.json(), response.json())
+        self.assertEqual(response.json()[0]['name'], 'Мука ржаная')
+
+
+class SubscriptionsTest(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user('user')
+        self.client = self.get_client(self.user)
+
+    def subscribe(self, count):
+        authors = []
+        start = Subscribe.objects.filter(user=self.user).count()
+        for number in range(start, start + count):
+            author = self.create_user(f'author{number}')
+            for name in ('Первый', 'Второй', 'Третий'):
+                self.create_recipe(author, name=name)
+            Subscribe.objects.create(user=self.user, owner=author)
+            authors.append(author)
+        return authors
+
+    def test_empty_subscriptions_with_recipes_limit(self):
+        for params in ({}, {'recipes_limit': 3}):
+            response = self.client.get('/api/users/subscriptions/', params)
+            self.assertEqual(response.status_code, 200, response.content)
+            self.assertEqual(response.json()['results'], [])
+
+    def test_recipes_limit_per_author(self):
+        self.subscribe(2)
+        response = self.client.get(
+            '/api/users/subscriptions/', {'recipes_limit': 2}
+        )
+        for author in response.json()['results']:
+            self.assertEqual(
+                [recipe['name'] for recipe in author['recipes']],
+                ['Первый', 'Второй']
+            )
+            self.assertEqual(author['recipes_count'], 3)
+
+    def test_constant_queries(self):
+        self.subscribe(1)
+        self.client.get('/api/users/subscriptions/')
+        with self.assertNumQueries(3):
+            self.client.get('/api/users/subscriptions/', {'recipes_limit': 2})
+        self.subscribe(3)
+        with self.assertNumQueries(3):
+            self.client.get('/api/users/subscriptions/', {'recipes_limit': 2})
+
+
+class RecipeListCacheTest(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.author = self.create_user('author')
+        self.create_recipe(self.author)
+
+    def test_anonymous_hit_skips_database(self):
+        first = self.client.get('/api/recipes/?limit=6')
+        self.assertEqual(first['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/recipes/?limit=6')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.content, first.content)
+
+    def test_hit_does_not_write_to_cache(self):
+        self.client.get('/api/recipes/')
+        with mock.patch.object(LocMemCache, 'set') as cache_set, \
+                mock.patch.object(LocMemCache, 'add') as cache_add, \
+                mock.patch.object(LocMemCache, 'incr') as cache_incr:
+            response = self.client.get('/api/recipes/')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        cache_set.assert_not_called()
+        cache_add.assert_not_called()
+        cache_incr.assert_not_called()
+
+    def test_new_recipe_invalidates_cache(self):
+        self.client.get('/api/recipes/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_recipe(self.author, name='Оладьи')
+        response = self.client.get('/api/recipes/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['count'], 2)
+
+    def test_key_follows_filter_parameters(self):
+        for name, slug in (('Завтрак', 'breakfast'), ('Обед', 'lunch')):
+            self.create_recipe(self.author, tags=(
+                Tag.objects.create(name=name, slug=slug),
+            ))
+        self.client.get('/api/recipes/', {'tags': 'breakfast'})
+        response = self.client.get('/api/recipes/', {'author': self.author.id})
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['count'], 3)
+        response = self.client.get(
+            '/api/recipes/?tags=breakfast&utm_source=mail'
+        )
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.json()['count'], 1)
+        self.client.get('/api/recipes/', {'tags': ['breakfast', 'lunch']})
+        response = self.client.get('/api/recipes/?tags=lunch&tags=breakfast')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.json()['count'], 2)
+
+    def test_error_response_is_not_cached(self):
+        for _ in range(2):
+            response = self.client.get('/api/recipes/', {'author': 999})
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(get_recipes_cache_stats()['misses'], 2)
+
+    def test_authenticated_list_is_not_cached(self):
+        response = self.get_client(self.author).get('/api/recipes/')
+        self.assertNotIn('X-Cache', response)
+
+    def test_cache_stats(self):
+        self.client.get('/api/recipes/')
+        self.client.get('/api/recipes/')
+        self.client.get('/api/recipes/')
+        admin = User.objects.create_superuser(
+            email='admin@example.com', password='password', username='admin',
+            first_name='Имя', last_name='Фамилия'
+        )
+        self.assertEqual(
+            self.get_client(admin).get('/api/recipes/cache_stats/').json(),
+            {'hits': 2, 'misses': 1, 'hit_ratio': 0.6667}
+        )
+
+
+class ShortLinkTest(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.recipe = self.create_recipe(self.create_user('author'))
+
+    def get_short_path(self, recipe_id):
+        response = self.client.get(f'/api/recipes/{recipe_id}/get-link/')
+        self.assertEqual(response.status_code, 200)
+        return urlparse(response.json()['short-link']).path
+
+    def test_short_link_resolves_without_database(self):
+        path = self.get_short_path(self.recipe.id)
+        with self.assertNumQueries(0):
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(
+            response['Location'].endswith(f'/recipes/{self.recipe.id}')
+        )
+
+    def test_unknown_recipe(self):
+        self.assertEqual(
+            self.client.get('/api/recipes/999/get-link/').status_code, 404
+        )
+
+    def test_deleted_recipe_expires_in_other_workers(self):
+        recipe_id = self.recipe.id
+        path = self.get_short_path(recipe_id)
+        self.recipe.delete()
+        recipe_id_cache.set(recipe_id, True)
+        self.assertEqual(self.client.get(path).status_code, 302)
+        expired = time.monotonic() + settings.SHORT_LINK_CACHE_TTL + 1
+        with mock.patch('time.monotonic', return_value=expired):
+            self.assertEqual(self.client.get(path).status_code, 404)
+
+
+class PantryTest(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.author = self.create_user('author')
+        self.flour, self.sugar, self.salt = (
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('Мука', 'Сахар', 'Соль')
+        )
+
+    def search(self, *ingredients):
+        response = self.client.get('/api/recipes/pantry/', {
+            'ingredients': [ingredient.id for ingredient in ingredients]
+        })
+        self.assertEqual(response.status_code, 200, response.content)
+        return [recipe['id'] for recipe in response.json()]
+
+    def test_ranking(self):
+        half = self.create_recipe(self.author, (self.flour, self.salt))
+        both = self.create_recipe(self.author, (self.flour, self.sugar))
+        single = self.create_recipe(self.author, (self.flour,))
+        self.assertEqual(
+            self.search(self.flour, self.sugar), [both.id, single.id, half.id]
+        )
+
+    def test_ties_prefer_newer_recipes(self):
+        older = self.create_recipe(self.author, (self.flour,))
+        newer = self.create_recipe(self.author, (self.flour,))
+        self.assertEqual(self.search(self.flour), [newer.id, older.id])
+
+    def test_index_follows_recipe_changes(self):
+        recipe = self.create_recipe(self.author, (self.flour,))
+        self.assertEqual(self.search(self.sugar), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            added = self.create_recipe(self.author, (self.sugar,))
+        self.assertEqual(self.search(self.sugar), [added.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.delete()
+        self.assertEqual(self.search(self.flour), [])
+
+    def test_search_queries(self):
+        self.create_recipe(self.author, (self.flour,))
+        self.search(self.flour)
+        with self.assertNumQueries(4):
+            self.search(self.flour)
+        for number in range(5):
+            self.create_recipe(
+                self.create_user(f'author{number}'), (self.flour,)
+            )
+        pantry_index.invalidate()
+        self.search(self.flour)
+        with self.assertNumQueries(4):
+            self.assertEqual(len(self.search(self.flour)), 6)
+
+    def test_limit(self):
+        recipes = [
+            self.create_recipe(self.author, (self.flour,)) for _ in range(3)
+        ]
+        response = self.client.get('/api/recipes/pantry/', {
+            'ingredients': [self.flour.id], 'limit': 2
+        })
+        self.assertEqual(
+            [recipe['id'] for recipe in response.json()],
+            [recipes[2].id, recipes[1].id]
+        )
+
+    def test_invalid_params(self):
+        for params in (
+            {},
+            {'ingredients': ['мука']},
+            {'ingredients': [self.flour.id], 'limit': 0},
+            {'ingredients': [self.flour.id],
+             'limit': settings.PANTRY_SEARCH_MAX_LIMIT + 1},
+        ):
+            with self.subTest(params=params):
+                self.assertEqual(
+                    self.client.get(
+                        '/api/recipes/pantry/', params
+                    ).status_code,
+                    400
+                )
+
+    def test_search_does_not_wait_for_rebuild(self):
+        recipe = self.create_recipe(self.author, (self.flour,))
+        self.search(self.flour)
+        results = []
+        with mock.patch.object(pantry_index, 'ttl', 0):
+            with pantry_index._lock:
+                thread = threading.Thread(target=lambda: results.append(
+                    pantry_index.search([self.flour.id], 10)
+                ))
+                thread.start()
+                thread.join(5)
+        self.assertEqual(results, [[(recipe.id, 1.0)]])
+
+
+class Base64ImageFieldTest(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.get_client(self.create_user('user'))
+
+    def put_avatar(self, image):
+        return self.client.put(
+            '/api/users/me/avatar/', {'avatar': image}, format='json'
+        )
+
+    def test_valid_image(self):
+        self.assertEqual(self.put_avatar(get_image((4, 4))).status_code, 200)
+
+    @override_settings(BASE64_IMAGE_MAX_SIZE=100)
+    def test_size_limit(self):
+        response = self.put_avatar(get_image((64, 64), noise=True))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('100 байт', response.json()['avatar'][0])
+
+    @override_settings(BASE64_IMAGE_MAX_PIXELS=100)
+    def test_pixel_limit(self):
+        response = self.put_avatar(get_image((20, 20)))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('100 пикселей', response.json()['avatar'][0])
+
+    @override_settings(BASE64_IMAGE_MAX_PIXELS=100)
+    def test_pixel_limit_checked_before_decoding_payload(self):
+        image = get_image((200, 200), noise=True)
+        self.assertGreater(len(image), 2 * BASE64_CHUNK_SIZE)
+        with mock.patch(
+            'api.fields.base64.b64decode', wraps=base64.b64decode
+        ) as b64decode:
+            with self.assertRaises(ValidationError):
+                Base64ImageField().to_internal_value(image)
+        self.assertEqual(b64decode.call_count, 1)
+
+    def test_invalid_image(self):
+        response = self.put_avatar('data:image/png;base64,bm90IGFuIGltYWdl')
+        self.assertEqual(response.status_code, 400)
+
+
+class CounterFieldsTest(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.author = self.create_user('author')
+        self.reader = self.create_user('reader')
+        self.client = self.get_client(self.author)
+        self.tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+        self.ingredient = Ingredient.objects.create(
+            name='Мука', measurement_unit='г'
+        )
+
+    def post_recipe(self):
+        response = self.client.post('/api/recipes/', {
+            'ingredients': [{'id': self.ingredient.id, 'amount': 10}],
+            'tags': [self.tag.id],
+            'image': get_image(),
+            'name': 'Блины',
+            'text': 'Смешать и пожарить',
+            'cooking_time': 20,
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()['id']
+
+    def test_avatar_put_keeps_recipes_count(self):
+        self.client.get('/api/users/me/')
+        self.post_recipe()
+        response = self.client.put(
+            '/api/users/me/avatar/', {'avatar': get_image()}, format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.recipes_count, 1)
+
+    def test_recipe_patch_keeps_favorites_count(self):
+        recipe_id = self.post_recipe()
+        response = self.get_client(self.reader).post(
+            f'/api/recipes/{recipe_id}/favorite/'
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        response = self.client.patch(f'/api/recipes/{recipe_id}/', {
+            'ingredients': [{'id': self.ingredient.id, 'amount': 20}],
+            'tags': [self.tag.id],
+            'name': 'Оладьи',
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        recipe = Recipe.objects.get(id=recipe_id)
+        self.assertEqual(recipe.name, 'Оладьи')
+        self.assertEqual(recipe.favorites_count, 1)
+
+    def test_counters_follow_changes(self):
+        recipe_id = self.post_recipe()
+        reader = self.get_client(self.reader)
+        reader.post(f'/api/recipes/{recipe_id}/favorite/')
+        reader.post(f'/api/recipes/{recipe_id}/shopping_cart/')
+        recipe = Recipe.objects.get(id=recipe_id)
+        self.assertEqual(recipe.favorites_count, 1)
+        self.assertEqual(recipe.in_carts_count, 1)
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.recipes_count, 1)
+        self.assertEqual(
+            self.client.delete(f'/api/recipes/{recipe_id}/').status_code, 204
+        )
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.recipes_count, 0)
+
+    def test_recount_command(self):
+        recipe_id = self.post_recipe()
+        Favorite.objects.create(
+            user=self.reader, recipe=Recipe.objects.get(id=recipe_id)
+        )
+        Recipe.objects.filter(id=recipe_id).update(
+            favorites_count=5, in_carts_count=2
+        )
+        User.objects.filter(id=self.author.id).update(recipes_count=0)
+        stdout = io.StringIO()
+        call_command('recount', stdout=stdout)
+        self.assertEqual(stdout.getvalue().splitlines(), [
+            'favorites_count: исправлено 1',
+            'in_carts_count: исправлено 1',
+            'recipes_count: исправлено 1',
+        ])
+        recipe = Recipe.objects.get(id=recipe_id)
+        self.assertEqual(recipe.favorites_count, 1)
+        self.assertEqual(recipe.in_carts_count, 0)
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.recipes_count, 1)
+        stdout = io.StringIO()
+        call_command('recount', stdout=stdout)
+        self.assertNotIn('исправлено 1', stdout.getvalue())
+
+    def test_stale_instance_save_keeps_counters(self):
+        recipe = Recipe.objects.get(id=self.post_recipe())
+        Favorite.objects.create(user=self.reader, recipe=recipe)
+        recipe.name = 'Оладьи'
+        recipe.save()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.name, 'Оладьи')
+        self.assertEqual(recipe.favorites_count, 1)
+
+
+class TokenCacheTest(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user('user')
+        self.client = self.get_client(self.user)
+        self.key = Token.objects.get(user=self.user).key
+
+    def test_repeated_get_skips_token_query(self):
+        with self.assertNumQueries(2):
+            self.client.get('/api/users/me/')
+        with mock.patch(
+            'api.authentication.get_token_version'
+        ) as get_token_version:
+            for _ in range(3):
+                with self.assertNumQueries(1):
+                    response = self.client.get('/api/users/me/')
+                self.assertEqual(response.status_code, 200)
+        get_token_version.assert_not_called()
+
+    @override_settings(TOKEN_CACHE_CHECK_INTERVAL=0)
+    def test_expired_entry_checks_shared_version(self):
+        self.client.get('/api/users/me/')
+        with self.assertNumQueries(1):
+            self.client.get('/api/users/me/')
+
+    def test_unsafe_method_reads_user_from_database(self):
+        self.client.get('/api/users/me/')
+        User.objects.filter(pk=self.user.pk).update(first_name='Новое')
+        self.client.patch('/api/users/me/', {'last_name': 'Другая'})
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.first_name, 'Новое')
+        self.assertEqual(self.user.last_name, 'Другая')
+
+    @override_settings(TOKEN_CACHE_CHECK_INTERVAL=0)
+    def assert_revoked_in_other_workers(self, revoke):
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 200)
+        entry = token_cache.get(self.key)
+        with self.captureOnCommitCallbacks(execute=True):
+            revoke()
+        token_cache.set(self.key, entry)
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 401)
+
+    def test_logout_revokes_cached_token(self):
+        self.assert_revoked_in_other_workers(
+            lambda: self.client.post('/api/auth/token/logout/')
+        )
+
+    def test_deactivation_revokes_cached_token(self):
+        def deactivate():
+            self.user.is_active = False
+            self.user.save()
+
+        self.assert_revoked_in_other_workers(deactivate)
+
+
+class AsgiTest(BaseAPITransactionTestCase):
+
+    def asgi_get(self, path, query_string=b'', headers=()):
+        async def request():
+            communicator = ApplicationCommunicator(application, {
+                'type': 'http',
+                'asgi': {'version': '3.0'},
+                'http_version': '1.1',
+                'method': 'GET',
+                'scheme': 'http',
+                'path': path,
+                'query_string': query_string,
+                'headers': [(b'host', b'testserver'), *headers],
+                'server': ('testserver', 80),
+                'client': ('127.0.0.1', 0),
+            })
+            await communicator.send_input({'type': 'http.request'})
+            start = await communicator.receive_output(5)
+            body = b''
+            while True:
+                message = await communicator.receive_output(5)
+                body += message.get('body', b'')
+                if not message.get('more_body'):
+                    break
+            return start['status'], body
+
+        return async_to_sync(request)()
+
+    def test_download_shopping_cart(self):
+        user = self.create_user('user')
+        recipe = self.create_recipe(user, ingredients=(
+            Ingredient.objects.create(name='Мука', measurement_unit='г'),
+            Ingredient.objects.create(name='Сахар', measurement_unit='г'),
+        ))
+        ShoppingCart.objects.create(user=user, recipe=recipe)
+        key = Token.objects.create(user=user).key
+        status, body = self.asgi_get(
+            '/api/recipes/download_shopping_cart/',
+            b'format=csv',
+            [(b'authorization', f'Token {key}'.encode())]
+        )
+        self.assertEqual(status, 200)
+        self.assertEqual(
+            body.decode().splitlines(),
+            ['name,amount,measurement_unit', 'Мука,10,г', 'Сахар,10,г']
+        )
+
+    def test_cache_lookup_runs_in_request_thread(self):
+        threads = []
+
+        def get_recipes_key(request):
+            threads.append(('lookup', threading.get_ident()))
+            return get_key(request)
+
+        def finished(**kwargs):
+            threads.append(('finished', threading.get_ident()))
+
+        get_key = api_cache.get_recipes_key
+        request_finished.connect(finished)
+        self.addCleanup(request_finished.disconnect, finished)
+        with mock.patch.object(
+            api_cache, 'get_recipes_key', get_recipes_key
+        ):
+            status, _ = self.asgi_get('/api/recipes/')
+        self.assertEqual(status, 200)
+        self.assertEqual(threads[0][0], 'lookup')
+        self.assertEqual(threads[0][1], threads[-1][1])
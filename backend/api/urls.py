@@ -3,9 +3,11 @@ from django.conf.urls.static import static
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
+from .async_views import async_read_urls
 from .views import (
     IngredientView,
     CustomUserViewSet,
+    PoolStatsView,
     RecipeView,
     TagView
 )
@@ -19,7 +21,8 @@ router.register('users', CustomUserViewSet, basename='follow')
 
 
 urlpatterns = [
-    path('', include(router.urls)),
+    path('pool_stats/', PoolStatsView.as_view(), name='pool_stats'),
+    path('', include(async_read_urls(router.urls))),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken'))
 ]
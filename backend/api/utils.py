@@ -1,52 +1,116 @@
+import csv
+import json
+
+from django.db import IntegrityError, transaction
 from django.shortcuts import get_object_or_404
 from rest_framework import serializers, status
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from recipes.counters import update_counter
+
+
+def util_format_ids(ids):
+    return ', '.join(str(pk) for pk in ids)
 
 
 def util_favorite_shoppingcart(self, request, pk, params):
-    serializer = params['serializer'](
-        data={
-            'user': self.request.user.pk,
-            'recipe': get_object_or_404(params['base_model'], id=pk).pk},
-        context={'request': request}
-    )
+    related_model = params['related_model']
     if request.method == "DELETE":
-        if params['related_model'].objects.filter(
-            user=self.request.user,
-            recipe=get_object_or_404(params['base_model'], id=pk)
-        ).exists():
-            params['related_model'].objects.get(
+        with transaction.atomic():
+            deleted, _ = related_model.objects.filter(
                 user=self.request.user,
-                recipe=get_object_or_404(params['base_model'], id=pk)
+                recipe=pk
             ).delete()
+            if deleted:
+                update_counter(related_model, pk, -deleted)
+        if deleted:
             return Response(status=status.HTTP_204_NO_CONTENT)
+        get_object_or_404(params['base_model'], id=pk)
         return Response(status=status.HTTP_400_BAD_REQUEST)
-    serializer.is_valid(raise_exception=True)
-    serializer.save(
-        user=self.request.user,
-        recipe=get_object_or_404(params['base_model'], id=pk)
+    recipe = get_object_or_404(
+        params['base_model'].objects.only('image', 'cooking_time'),
+        id=pk
     )
+    try:
+        with transaction.atomic():
+            instance = related_model.objects.create(
+                user=self.request.user,
+                recipe=recipe
+            )
+    except IntegrityError:
+        raise serializers.ValidationError({
+            api_settings.NON_FIELD_ERRORS_KEY: ['Повторная подписка запрещена']
+        })
     return Response(
-        serializer.data,
+        params['serializer'](instance, context={'request': request}).data,
         status=status.HTTP_201_CREATED
     )
 
 
-def util_validate_recipe_subscriptions(self, data, related_model):
-    if related_model.objects.filter(
-        user=data.get('user'),
-        recipe=data.get('recipe')
-    ).exists():
-        raise serializers.ValidationError(
-            'Повторная подписка запрещена'
-        )
-    return data
-
-
-def util_favorited_shopping_cart(self, obj, base_model):
+def util_favorited_shopping_cart(self, obj, base_model, annotation):
+    if hasattr(obj, annotation):
+        return getattr(obj, annotation)
     if not self.context.get('request').user.is_authenticated:
         return False
     return base_model.objects.filter(
         user=self.context.get('request').user,
         recipe=obj.id
     ).exists()
+
+
+class Echo:
+
+    def write(self, value):
+        return value
+
+
+def util_join_chunks(lines, size):
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= size:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+def util_shopping_list_txt(rows):
+    yield 'Список покупок:\n'
+    for row in rows:
+        yield (
+            f'{row["ingredient__name"]}: {row["result_amount"]}'
+            f'{row["ingredient__measurement_unit"]}\n'
+        )
+
+
+def util_shopping_list_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('name', 'amount', 'measurement_unit'))
+    for row in rows:
+        yield writer.writerow((
+            row['ingredient__name'],
+            row['result_amount'],
+            row['ingredient__measurement_unit']
+        ))
+
+
+def util_shopping_list_json(rows):
+    yield '['
+    separator = ''
+    for row in rows:
+        yield separator + json.dumps({
+            'name': row['ingredient__name'],
+            'amount': row['result_amount'],
+            'measurement_unit': row['ingredient__measurement_unit']
+        }, ensure_ascii=False)
+        separator = ','
+    yield ']'
+
+
+SHOPPING_LIST_FORMATS = {
+    'txt': (util_shopping_list_txt, 'text/plain; charset=utf-8'),
+    'csv': (util_shopping_list_csv, 'text/csv; charset=utf-8'),
+    'json': (util_shopping_list_json, 'application/json; charset=utf-8'),
+}
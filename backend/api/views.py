@@ -1,32 +1,59 @@
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.http import HttpResponse, HttpResponseRedirect
+from django.db.models import (
+    F, Prefetch, Sum, Value, prefetch_related_objects
+)
+from django.http import (
+    Http404, HttpResponseRedirect, StreamingHttpResponse
+)
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
 from django.utils import baseconv
 from djoser.views import UserViewSet
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import filters, mixins, status, viewsets
+from rest_framework import mixins, status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 from rest_framework.viewsets import GenericViewSet
 
-from .filter import RecipeCustomFilter
-from .pagination import RecipePagination
+from .cache import (
+    cached_catalog_response,
+    cached_recipes_response,
+    get_recipes_cache_stats
+)
+from .filter import RecipeCustomFilter, RecipeOrderingFilter
+from .mixins import CachedCatalogMixin, CursorPaginationMixin
+from .negotiation import IgnoreFormatContentNegotiation
+from .pantry import pantry_index
+from .pagination import (
+    FeedCursorPagination, RecipeCursorPagination, RecipePagination,
+    UserCursorPagination
+)
 from .permissions import OwnerOrReadOnly
+from .search import ingredient_index
+from .shortlinks import SHORT_LINK_ALPHABET, recipe_id_cache
 from .serializers import (
     AvatarSerializer,
     FavoriteSerializer,
     IngredientSerializer,
+    PantrySerializer,
     ReadRecipeSerializer,
+    RecipeSerializer,
+    RecipesLimitSerializer,
     RecordRecipeSerializer,
     ShoppingCartSerializer,
+    ShoppingListFormatSerializer,
     SubscribeSerializer,
     TagSerializer
 )
-from .utils import util_favorite_shoppingcart
+from .utils import (
+    SHOPPING_LIST_FORMATS,
+    util_favorite_shoppingcart,
+    util_join_chunks
+)
+from backend.postgresql_pool.pool import get_pool_stats
 from recipes.models import (
     Favorite,
     Ingredient,
@@ -40,6 +67,8 @@ from recipes.models import (
 
 User = get_user_model()
 
+SHOPPING_LIST_CHUNK_SIZE = 500
+
 
 class AvatarViewSet(
     mixins.UpdateModelMixin,
@@ -54,6 +83,7 @@ class AvatarViewSet(
 
 
 class TagView(
+    CachedCatalogMixin,
     mixins.RetrieveModelMixin,
     mixins.ListModelMixin,
     GenericViewSet
@@ -64,6 +94,7 @@ class TagView(
 
 
 class IngredientView(
+    CachedCatalogMixin,
     mixins.RetrieveModelMixin,
     mixins.ListModelMixin,
     GenericViewSet
@@ -71,26 +102,107 @@ class IngredientView(
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     pagination_class = None
-    filter_backends = (filters.SearchFilter,)
-    search_fields = ('name',)
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get(api_settings.SEARCH_PARAM)
+        if not name:
+            return super().list(request, *args, **kwargs)
+        return cached_catalog_response(request, self.search, name)
+
+    def search(self, request, name):
+        return Response(ingredient_index.search(name))
 
-class RecipeView(viewsets.ModelViewSet):
+
+class RecipeView(CursorPaginationMixin, viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     permission_classes = (OwnerOrReadOnly,)
-    filter_backends = (DjangoFilterBackend, filters.OrderingFilter)
-    ordering = ('created_at',)
+    filter_backends = (DjangoFilterBackend, RecipeOrderingFilter)
+    ordering = ('created_at', 'id')
+    ordering_fields = (
+        'id', 'name', 'cooking_time', 'created_at',
+        'favorites_count', 'in_carts_count'
+    )
     filterset_class = RecipeCustomFilter
     pagination_class = RecipePagination
+    cursor_pagination_class = RecipeCursorPagination
+
+    def get_queryset(self):
+        queryset = Recipe.objects.with_user_flags(self.request.user)
+        if self.action in ('retrieve', 'list'):
+            return queryset.with_related(self.request.user)
+        return queryset
 
     def get_serializer_class(self):
         if self.action in ('retrieve', 'list'):
             return ReadRecipeSerializer
         return RecordRecipeSerializer
 
+    def list(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return super().list(request, *args, **kwargs)
+        return cached_recipes_response(request, super().list, *args, **kwargs)
+
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    @action(
+        detail=False,
+        url_path='cache_stats',
+        permission_classes=(IsAdminUser,)
+    )
+    def cache_stats(self, request):
+        return Response(get_recipes_cache_stats(), status=status.HTTP_200_OK)
+
+    @action(detail=False, permission_classes=(IsAuthenticated,))
+    def feed(self, request):
+        queryset = Recipe.objects.filter(
+            feed_entries__user=request.user
+        ).annotate(
+            feed_created_at=F('feed_entries__created_at')
+        ).with_user_flags(request.user).with_related(request.user)
+        paginator = FeedCursorPagination()
+        page = paginator.paginate_queryset(queryset, request)
+        serializer = ReadRecipeSerializer(
+            page, context=self.get_serializer_context(), many=True
+        )
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False)
+    def pantry(self, request):
+        serializer = PantrySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        ranked = pantry_index.search(
+            serializer.validated_data['ingredients'],
+            serializer.validated_data['limit']
+        )
+        recipes = Recipe.objects.with_user_flags(request.user).with_related(
+            request.user
+        ).in_bulk([recipe_id for recipe_id, _ in ranked])
+        return Response(
+            ReadRecipeSerializer(
+                [recipes[recipe_id] for recipe_id, _ in ranked
+                 if recipe_id in recipes],
+                context=self.get_serializer_context(),
+                many=True
+            ).data,
+            status=status.HTTP_200_OK
+        )
+
+    @action(detail=True)
+    def similar(self, request, pk):
+        get_object_or_404(Recipe.objects.only('id'), pk=pk)
+        queryset = Recipe.objects.filter(
+            similar_for__recipe=pk
+        ).annotate(
+            similarity=F('similar_for__score')
+        ).only(
+            'name', 'image', 'cooking_time'
+        ).order_by('-similarity', 'id')
+        return Response(
+            RecipeSerializer(queryset, many=True).data,
+            status=status.HTTP_200_OK
+        )
+
     @action(methods=['POST', 'DELETE'], detail=True)
     def favorite(self, request, pk):
         params = {
@@ -111,8 +223,9 @@ class RecipeView(viewsets.ModelViewSet):
 
     @action(detail=True, url_path='get-link')
     def get_link(self, request, pk):
-        recipe = get_object_or_404(Recipe, id=pk)
-        encode_id = baseconv.base64.encode(recipe.id)
+        if not pk.isdigit() or not recipe_id_cache.exists(int(pk)):
+            raise Http404
+        encode_id = baseconv.base64.encode(int(pk))
         short_link = request.build_absolute_uri(
             reverse('shortlink', kwargs={'encoded_id': encode_id})
         )
@@ -121,30 +234,37 @@ class RecipeView(viewsets.ModelViewSet):
     @action(
         detail=False,
         url_path='download_shopping_cart',
-        permission_classes=(IsAuthenticated,)
+        permission_classes=(IsAuthenticated,),
+        content_negotiation_class=IgnoreFormatContentNegotiation
     )
     def download(self, request):
-        queryset = IngredientRecipe.objects.filter(
+        serializer = ShoppingListFormatSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        file_format = serializer.validated_data['format']
+        writer, content_type = SHOPPING_LIST_FORMATS[file_format]
+        # Строки читаются до ответа: под ASGI тело потоковой выдачи
+        # перебирается в цикле событий, где ORM недоступен.
+        rows = list(IngredientRecipe.objects.filter(
             recipe__shopping_carts__user=self.request.user
         ).values(
             'ingredient__name',
             'ingredient__measurement_unit'
-        ).annotate(result_amount=Sum('amount'))
-        list_shop = 'Список покупок:\n'
-        for part in queryset:
-            list_shop += (
-                f'{part["ingredient__name"]}: {part["result_amount"]}'
-                f'{part["ingredient__measurement_unit"]}\n'
-            )
-        response = HttpResponse(list_shop, content_type='text/txt')
+        ).annotate(
+            result_amount=Sum('amount')
+        ).order_by('ingredient__name'))
+        response = StreamingHttpResponse(
+            util_join_chunks(writer(rows), SHOPPING_LIST_CHUNK_SIZE),
+            content_type=content_type
+        )
         response['Content-Disposition'] = (
-            'attachment; filename="exported_data.txt"'
+            f'attachment; filename="exported_data.{file_format}"'
         )
         return response
 
 
-class CustomUserViewSet(UserViewSet):
+class CustomUserViewSet(CursorPaginationMixin, UserViewSet):
     pagination_class = RecipePagination
+    cursor_pagination_class = UserCursorPagination
 
     @action(
         methods=['GET', 'PUT', 'PATCH', 'DELETE'],
@@ -154,12 +274,34 @@ class CustomUserViewSet(UserViewSet):
     def me(self, request, *args, **kwargs):
         return super().me(request)
 
+    def get_recipes_limit(self):
+        serializer = RecipesLimitSerializer(data=self.request.query_params)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data.get('recipes_limit')
+
     @action(methods=['GET'], detail=False)
     def subscriptions(self, request):
-        queryset = self.request.user.subscribers.all()
+        recipes_limit = self.get_recipes_limit()
+        queryset = self.request.user.subscribers.select_related(
+            'owner'
+        ).annotate(
+            is_subscribed=Value(True)
+        ).order_by('id')
         pages = self.paginate_queryset(queryset)
+        prefetch_related_objects(pages, Prefetch(
+            'owner__recipes',
+            queryset=Recipe.objects.filter(
+                author__in=[subscribe.owner_id for subscribe in pages]
+            ).only(
+                'author', 'name', 'image', 'cooking_time'
+            ).order_by(
+                'created_at', 'id'
+            ).limit_per_author(recipes_limit),
+            to_attr='limited_recipes'
+        ))
         serializer = SubscribeSerializer(
-            pages, context={'request': request},
+            pages,
+            context={'request': request, 'recipes_limit': recipes_limit},
             many=True
         )
         return self.get_paginated_response(serializer.data)
@@ -171,7 +313,10 @@ class CustomUserViewSet(UserViewSet):
                 'user': self.request.user.id,
                 'owner': get_object_or_404(User, id=id).id
             },
-            context={'request': request})
+            context={
+                'request': request,
+                'recipes_limit': self.get_recipes_limit()
+            })
         if request.method == "DELETE":
             if Subscribe.objects.filter(
                 user=self.request.user.id,
@@ -206,12 +351,20 @@ class CustomUserViewSet(UserViewSet):
 
 class ShortLinkView(APIView):
     def get(self, request, encoded_id):
-        if not set(encoded_id).issubset(set(baseconv.BASE64_ALPHABET)):
+        if not SHORT_LINK_ALPHABET.issuperset(encoded_id):
             return Response(status=status.HTTP_400_BAD_REQUEST)
         recipe_id = baseconv.base64.decode(encoded_id)
-        recipe = get_object_or_404(Recipe, id=recipe_id)
+        if not recipe_id_cache.exists(recipe_id):
+            raise Http404
         return HttpResponseRedirect(
             request.build_absolute_uri(
-                f'/recipes/{recipe.id}'
+                f'/recipes/{recipe_id}'
             )
         )
+
+
+class PoolStatsView(APIView):
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response(get_pool_stats(), status=status.HTTP_200_OK)
@@ -0,0 +1,143 @@
+import os
+import threading
+import time
+
+import psycopg2
+from psycopg2 import pool
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class ConnectionPool:
+    """Пул соединений одного процесса поверх ThreadedConnectionPool:
+    ожидание свободного соединения, проверка при выдаче, ограничение
+    времени жизни и статистика."""
+
+    def __init__(
+        self, conn_params, size, timeout, max_lifetime, health_check_interval
+    ):
+        self.size = size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.health_check_interval = health_check_interval
+        self.pid = os.getpid()
+        self._pool = pool.ThreadedConnectionPool(size, size, **conn_params)
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._created_at = {}
+        self._returned_at = {}
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time': 0.0,
+            'timeouts': 0,
+            'discarded': 0,
+            'in_use': 0,
+        }
+
+    def count(self, name, value=1):
+        with self._lock:
+            self._stats[name] += value
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['size'] = self.size
+        stats['wait_time'] = round(stats['wait_time'], 6)
+        return stats
+
+    def getconn(self):
+        if not self._slots.acquire(blocking=False):
+            started_at = time.monotonic()
+            self.count('waits')
+            acquired = self._slots.acquire(timeout=self.timeout)
+            self.count('wait_time', time.monotonic() - started_at)
+            if not acquired:
+                self.count('timeouts')
+                raise pool.PoolError(
+                    f'Нет свободного соединения за {self.timeout} с'
+                )
+        try:
+            connection = self.checkout()
+        except BaseException:
+            self._slots.release()
+            raise
+        self.count('checkouts')
+        self.count('in_use')
+        return connection
+
+    def checkout(self):
+        while True:
+            connection = self._pool.getconn()
+            now = time.monotonic()
+            self._created_at.setdefault(id(connection), now)
+            if self.is_usable(connection, now):
+                return connection
+            self.discard(connection)
+
+    def is_usable(self, connection, now):
+        if connection.closed:
+            return False
+        if now - self._created_at[id(connection)] > self.max_lifetime:
+            return False
+        returned_at = self._returned_at.get(id(connection), now)
+        if now - returned_at < self.health_check_interval:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            connection.rollback()
+        except psycopg2.Error:
+            return False
+        return True
+
+    def putconn(self, connection):
+        try:
+            if connection.closed or (
+                time.monotonic() - self._created_at.get(id(connection), 0)
+                > self.max_lifetime
+            ):
+                self.discard(connection)
+            else:
+                self._returned_at[id(connection)] = time.monotonic()
+                self._pool.putconn(connection)
+        finally:
+            self.count('in_use', -1)
+            self._slots.release()
+
+    def discard(self, connection):
+        self._created_at.pop(id(connection), None)
+        self._returned_at.pop(id(connection), None)
+        self._pool.putconn(connection, close=True)
+        self.count('discarded')
+
+    def closeall(self):
+        self._pool.closeall()
+
+
+def get_pool(alias, conn_params, options):
+    key = (alias, repr(sorted(conn_params.items())))
+    current = _pools.get(key)
+    if current is not None and current.pid == os.getpid():
+        return current
+    with _pools_lock:
+        current = _pools.get(key)
+        if current is None or current.pid != os.getpid():
+            current = _pools[key] = ConnectionPool(
+                conn_params,
+                size=options.get('SIZE', 4),
+                timeout=options.get('TIMEOUT', 10),
+                max_lifetime=options.get('MAX_LIFETIME', 1800),
+                health_check_interval=options.get(
+                    'HEALTH_CHECK_INTERVAL', 30
+                )
+            )
+        return current
+
+
+def get_pool_stats():
+    return {
+        alias: current.get_stats() for (alias, _), current in _pools.items()
+        if current.pid == os.getpid()
+    }
@@ -63,12 +63,30 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': os.getenv('DB_ENGINE', 'backend.postgresql_pool'),
         'NAME': os.getenv('POSTGRES_DB', 'django'),
         'USER': os.getenv('POSTGRES_USER', 'django'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', ''),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'PORT': os.getenv('DB_PORT', 5432),
+        'POOL': {
+            'SIZE': int(os.getenv('DB_POOL_SIZE', 4)),
+            'TIMEOUT': int(os.getenv('DB_POOL_TIMEOUT', 10)),
+            'MAX_LIFETIME': int(os.getenv('DB_POOL_MAX_LIFETIME', 1800)),
+            'HEALTH_CHECK_INTERVAL': int(
+                os.getenv('DB_POOL_HEALTH_CHECK_INTERVAL', 30)
+            )
+        }
+    }
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.memcached.PyMemcacheCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'memcached:11211'),
     }
 }
 
@@ -113,13 +131,57 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 6,
     'SEARCH_PARAM': 'name'
 }
 
+BASE64_IMAGE_MAX_SIZE = 10 * 1024 * 1024
+
+BASE64_IMAGE_MAX_PIXELS = 25_000_000
+
+INGREDIENT_SEARCH_LIMIT = 50
+
+INGREDIENT_INDEX_TTL = 300
+
+CATALOG_CACHE_TIMEOUT = 300
+
+CATALOG_MAX_AGE = 60
+
+RECIPES_CACHE_TIMEOUT = 60
+
+SHORT_LINK_CACHE_SIZE = 100_000
+
+SHORT_LINK_CACHE_TTL = 300
+
+SHORT_LINK_NEGATIVE_TTL = 60
+
+TOKEN_CACHE_SIZE = 10_000
+
+TOKEN_CACHE_TTL = 60
+
+TOKEN_CACHE_CHECK_INTERVAL = 5
+
+ADMIN_EXACT_COUNT_LIMIT = 10_000
+
+FEED_FANOUT_BATCH_SIZE = 1000
+
+FEED_BACKFILL_SIZE = 100
+
+SIMILAR_RECIPES_TOP_K = 20
+
+SIMILAR_RECIPES_MAX_DF = 0.05
+
+SIMILAR_RECIPES_TAG_WEIGHT = 0.2
+
+PANTRY_SEARCH_LIMIT = 20
+
+PANTRY_SEARCH_MAX_LIMIT = 100
+
+PANTRY_INDEX_TTL = 300
+
 
 MEDIA_URL = '/media/'
 
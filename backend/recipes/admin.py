@@ -1,26 +1,35 @@
 from django.contrib import admin
 
+from .counters import delete_with_counters
 from .models import (
     Tag, Ingredient,
     Recipe, Subscribe,
     Favorite, ShoppingCart,
     IngredientRecipe, TagRecipe
 )
+from .paginators import EstimatedCountPaginator
 
 admin.site.empty_value_display = 'Не задано'
 
 
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
 class IngredientRecipeInline(admin.StackedInline):
     model = IngredientRecipe
+    autocomplete_fields = ('ingredient',)
     extra = 1
 
 
 class TagRecipeRecipeInline(admin.StackedInline):
     model = TagRecipe
+    autocomplete_fields = ('tag',)
     extra = 1
 
 
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(LargeTableAdmin):
     list_display = (
         'author',
         'image',
@@ -31,29 +40,67 @@ class RecipeAdmin(admin.ModelAdmin):
         'modified_at',
         'favorite'
     )
-    filter_horizontal = ('ingredients', 'tags')
+    list_select_related = ('author',)
+    autocomplete_fields = ('author',)
     search_fields = ('name', 'author__email')
     list_filter = ('tags',)
     list_display_links = ('name',)
+    readonly_fields = ('favorites_count', 'in_carts_count')
     inlines = (IngredientRecipeInline, TagRecipeRecipeInline)
 
     def favorite(self, obj):
-        return Favorite.objects.filter(recipe=obj).count()
+        return obj.favorites_count
     favorite.short_description = 'Количество добавлений в избранное'
+    favorite.admin_order_field = 'favorites_count'
 
 
-class IngredientAdmin(admin.ModelAdmin):
+class IngredientAdmin(LargeTableAdmin):
     list_display = (
         'name',
         'measurement_unit'
     )
 
     search_fields = ('name',)
+    ordering = ('name',)
+
+
+class TagAdmin(admin.ModelAdmin):
+    list_display = (
+        'name',
+        'slug'
+    )
+
+    search_fields = ('name', 'slug')
+    ordering = ('name',)
+
+
+class SubscribeAdmin(LargeTableAdmin):
+    list_display = (
+        'user',
+        'owner'
+    )
+    list_select_related = ('user', 'owner')
+    autocomplete_fields = ('user', 'owner')
+
+
+class FavoriteShoppingCartAdmin(LargeTableAdmin):
+    list_display = (
+        'user',
+        'recipe'
+    )
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
+
+    def delete_model(self, request, obj):
+        delete_with_counters(type(obj).objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        delete_with_counters(queryset)
 
 
-admin.site.register(Tag)
+admin.site.register(Tag, TagAdmin)
 admin.site.register(Ingredient, IngredientAdmin)
 admin.site.register(Recipe, RecipeAdmin)
-admin.site.register(Subscribe)
-admin.site.register(Favorite)
-admin.site.register(ShoppingCart)
+admin.site.register(Subscribe, SubscribeAdmin)
+admin.site.register(Favorite, FavoriteShoppingCartAdmin)
+admin.site.register(ShoppingCart, FavoriteShoppingCartAdmin)
@@ -0,0 +1,98 @@
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+COUNTERS = {
+    'recipes.Favorite': ('recipes.Recipe', 'recipe_id', 'favorites_count'),
+    'recipes.ShoppingCart': (
+        'recipes.Recipe', 'recipe_id', 'in_carts_count'
+    ),
+    'recipes.Recipe': (settings.AUTH_USER_MODEL, 'author_id', 'recipes_count'),
+}
+
+
+class CounterFieldsMixin:
+    """Не перезаписывает счётчики при сохранении всей строки.
+
+    Счётчики меняются только через F()-выражения, а значения в загруженном
+    экземпляре могут устареть.
+    """
+
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (
+            not self._state.adding and not args
+            and not kwargs.get('force_insert')
+            and kwargs.get('update_fields') is None
+        ):
+            skipped = set(self.counter_fields) | self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in skipped
+            ]
+        super().save(*args, **kwargs)
+
+
+def get_counter(sender):
+    model, field, counter = COUNTERS[sender._meta.label]
+    return apps.get_model(model), field, counter
+
+
+def change_counter(sender, instance, delta):
+    update_counter(sender, getattr(instance, get_counter(sender)[1]), delta)
+
+
+def update_counter(sender, pk, delta):
+    model, _, counter = get_counter(sender)
+    model.objects.filter(pk=pk).update(
+        **{counter: Greatest(F(counter) + delta, 0)}
+    )
+
+
+def delete_with_counters(queryset):
+    """Удаляет избранное или покупки и уменьшает счётчики рецептов.
+
+    Для Favorite и ShoppingCart нет сигналов post_delete, чтобы удаление
+    оставалось быстрым, поэтому счётчики меняются здесь.
+    """
+    sender = queryset.model
+    field = get_counter(sender)[1]
+    with transaction.atomic():
+        totals = list(queryset.order_by().values(field).annotate(
+            total=Count('pk')
+        ))
+        deleted, _ = queryset.delete()
+        for row in totals:
+            update_counter(sender, row[field], -row['total'])
+    return deleted
+
+
+def count_rows(related_model, field):
+    return Coalesce(
+        Subquery(
+            related_model.objects.filter(
+                **{field: OuterRef('pk')}
+            ).order_by().values(field).annotate(
+                total=Count('pk')
+            ).values('total')
+        ),
+        Value(0)
+    )
+
+
+def recount():
+    fixed = {}
+    for label in COUNTERS:
+        related_model = apps.get_model(label)
+        model, field, counter = get_counter(related_model)
+        actual = count_rows(related_model, field[:-len('_id')])
+        drifted = model.objects.annotate(actual=actual).exclude(
+            **{counter: F('actual')}
+        ).values('pk')
+        fixed[counter] = model.objects.filter(pk__in=drifted).update(
+            **{counter: actual}
+        )
+    return fixed
@@ -0,0 +1,50 @@
+from django.conf import settings
+
+from .models import FeedEntry, Recipe, Subscribe
+
+
+def fan_out(recipe):
+    fan_out_recipes(recipe.author_id, [recipe])
+
+
+def fan_out_recipes(author_id, recipes):
+    subscribers = Subscribe.objects.filter(
+        owner=author_id
+    ).order_by('user_id').values_list('user_id', flat=True)
+    last_user_id = 0
+    while True:
+        batch = list(subscribers.filter(
+            user_id__gt=last_user_id
+        )[:settings.FEED_FANOUT_BATCH_SIZE])
+        if not batch:
+            return
+        FeedEntry.objects.bulk_create((
+            FeedEntry(
+                user_id=user_id,
+                recipe_id=recipe.id,
+                created_at=recipe.created_at
+            ) for user_id in batch for recipe in recipes
+        ), batch_size=settings.FEED_FANOUT_BATCH_SIZE, ignore_conflicts=True)
+        last_user_id = batch[-1]
+
+
+def backfill(subscribe):
+    recipes = Recipe.objects.filter(
+        author=subscribe.owner_id
+    ).order_by('-created_at', '-id').values_list(
+        'id', 'created_at'
+    )[:settings.FEED_BACKFILL_SIZE]
+    FeedEntry.objects.bulk_create((
+        FeedEntry(
+            user_id=subscribe.user_id,
+            recipe_id=recipe_id,
+            created_at=created_at
+        ) for recipe_id, created_at in recipes
+    ), ignore_conflicts=True)
+
+
+def trim(subscribe):
+    FeedEntry.objects.filter(
+        user=subscribe.user_id,
+        recipe__author=subscribe.owner_id
+    ).delete()
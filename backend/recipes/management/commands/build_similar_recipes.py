@@ -0,0 +1,102 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from recipes.models import Recipe, SimilarRecipe
+from recipes.similarity import (
+    build_postings, init_worker, load_features, score_chunk
+)
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = 'Расчёт похожих рецептов по общим ингредиентам и тегам'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true')
+        parser.add_argument('--workers', type=int, default=os.cpu_count())
+        parser.add_argument(
+            '--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE
+        )
+
+    def handle(self, *args, **options):
+        started_at, timer = timezone.now(), time.monotonic()
+        ingredients, tags = load_features()
+        worker_args = (
+            ingredients,
+            tags,
+            build_postings(ingredients),
+            settings.SIMILAR_RECIPES_MAX_DF,
+            settings.SIMILAR_RECIPES_TOP_K,
+            settings.SIMILAR_RECIPES_TAG_WEIGHT
+        )
+        recipes = Recipe.objects.order_by('id')
+        if not options['full']:
+            recipes = recipes.filter(
+                Q(similar_updated_at__isnull=True)
+                | Q(modified_at__gt=F('similar_updated_at'))
+            )
+        changed = set(recipes.values_list('id', flat=True))
+        affected = set(SimilarRecipe.objects.filter(
+            similar__in=changed
+        ).values_list('recipe_id', flat=True))
+        neighbours = self.refresh(
+            sorted(changed), started_at, options, worker_args
+        )
+        self.refresh(
+            sorted((affected | neighbours) - changed),
+            started_at, options, worker_args
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено {len(changed)} рецептов и '
+            f'{len((affected | neighbours) - changed)} соседей '
+            f'за {time.monotonic() - timer:.1f} с'
+        ))
+
+    def refresh(self, recipe_ids, started_at, options, worker_args):
+        chunk_size = options['chunk_size']
+        chunks = [
+            recipe_ids[start:start + chunk_size]
+            for start in range(0, len(recipe_ids), chunk_size)
+        ]
+        neighbours = set()
+        if options['workers'] > 1 and len(chunks) > 1:
+            with ProcessPoolExecutor(
+                max_workers=options['workers'],
+                initializer=init_worker,
+                initargs=worker_args
+            ) as executor:
+                for results in executor.map(score_chunk, chunks):
+                    neighbours.update(self.save_chunk(results, started_at))
+        else:
+            init_worker(*worker_args)
+            for chunk in chunks:
+                neighbours.update(
+                    self.save_chunk(score_chunk(chunk), started_at)
+                )
+        return neighbours
+
+    @transaction.atomic
+    def save_chunk(self, results, started_at):
+        recipe_ids = [recipe_id for recipe_id, _ in results]
+        SimilarRecipe.objects.filter(recipe__in=recipe_ids).delete()
+        SimilarRecipe.objects.bulk_create(
+            SimilarRecipe(
+                recipe_id=recipe_id, similar_id=similar_id, score=score
+            )
+            for recipe_id, similar in results
+            for similar_id, score in similar
+        )
+        Recipe.objects.filter(pk__in=recipe_ids).update(
+            similar_updated_at=started_at
+        )
+        return {
+            similar_id for _, similar in results for similar_id, _ in similar
+        }
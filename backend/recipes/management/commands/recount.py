@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from recipes.counters import recount
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт счётчиков избранного, списков покупок и рецептов'
+
+    def handle(self, *args, **options):
+        for counter, fixed in recount().items():
+            self.stdout.write(f'{counter}: исправлено {fixed}')
@@ -0,0 +1,133 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.counters import recount
+from recipes.models import (
+    Favorite, Ingredient, IngredientRecipe, Recipe,
+    ShoppingCart, Subscribe, Tag, TagRecipe
+)
+
+User = get_user_model()
+
+SEED_IMAGE = 'recipes/images/seed.png'
+SEED_TAGS = (
+    ('Завтрак', 'breakfast'),
+    ('Обед', 'lunch'),
+    ('Ужин', 'dinner'),
+)
+
+
+class Command(BaseCommand):
+    help = 'Заполнение базы тестовыми рецептами для нагрузочных проверок'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--favorites-per-user', type=int, default=50)
+        parser.add_argument('--subscriptions-per-user', type=int, default=10)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+        if not ingredient_ids:
+            raise CommandError(
+                'Сначала загрузите ингредиенты: load_ingredients'
+            )
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        started_at = time.monotonic()
+        with transaction.atomic():
+            for name, slug in SEED_TAGS:
+                Tag.objects.get_or_create(slug=slug, defaults={'name': name})
+            tag_ids = list(Tag.objects.values_list('id', flat=True))
+            user_ids = self.create_users(options['users'])
+            recipe_ids = self.create_recipes(user_ids, options['recipes'])
+            self.bulk_create(IngredientRecipe, (
+                IngredientRecipe(
+                    recipe_id=recipe_id, ingredient_id=ingredient_id,
+                    amount=self.random.randint(1, 500)
+                )
+                for recipe_id in recipe_ids
+                for ingredient_id in self.sample(
+                    ingredient_ids, options['ingredients_per_recipe']
+                )
+            ))
+            self.bulk_create(TagRecipe, (
+                TagRecipe(recipe_id=recipe_id, tag_id=tag_id)
+                for recipe_id in recipe_ids
+                for tag_id in self.sample(tag_ids, self.random.randint(1, 2))
+            ))
+            for model in (Favorite, ShoppingCart):
+                self.bulk_create(model, (
+                    model(user_id=user_id, recipe_id=recipe_id)
+                    for user_id in user_ids
+                    for recipe_id in self.sample(
+                        recipe_ids, options['favorites_per_user']
+                    )
+                ))
+            self.bulk_create(Subscribe, (
+                Subscribe(user_id=user_id, owner_id=owner_id)
+                for user_id in user_ids
+                for owner_id in self.sample(
+                    user_ids, options['subscriptions_per_user']
+                )
+                if owner_id != user_id
+            ))
+            recount()
+            Recipe.objects.filter(pk__in=recipe_ids).update_search_index()
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано {len(user_ids)} пользователей и {len(recipe_ids)} '
+            f'рецептов за {time.monotonic() - started_at:.1f} с'
+        ))
+
+    def sample(self, population, count):
+        return self.random.sample(population, min(count, len(population)))
+
+    def bulk_create(self, model, objects):
+        batch = []
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) >= self.batch_size:
+                model.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            model.objects.bulk_create(batch)
+
+    def create_users(self, count):
+        prefix = f'seed{User.objects.count()}x'
+        password = make_password(None)
+        self.bulk_create(User, (
+            User(
+                email=f'{prefix}{number}@example.com',
+                username=f'{prefix}{number}',
+                first_name='Тест',
+                last_name=str(number),
+                password=password
+            )
+            for number in range(count)
+        ))
+        return list(User.objects.filter(
+            username__startswith=prefix
+        ).values_list('id', flat=True))
+
+    def create_recipes(self, user_ids, count):
+        self.bulk_create(Recipe, (
+            Recipe(
+                author_id=self.random.choice(user_ids),
+                image=SEED_IMAGE,
+                name=f'Рецепт {number}',
+                text='Тестовый рецепт',
+                cooking_time=self.random.randint(1, 180)
+            )
+            for number in range(count)
+        ))
+        return list(Recipe.objects.filter(
+            author__in=user_ids
+        ).values_list('id', flat=True))
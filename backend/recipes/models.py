@@ -1,7 +1,18 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
+from django.core.exceptions import EmptyResultSet
 from django.db import models
+from django.db.models import (
+    BooleanField, Exists, F, OuterRef, Prefetch, Value, Window
+)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
 
 from .abstract_models import TagIngredient
+from .counters import CounterFieldsMixin
+from .search import (
+    remove_from_search_index, search_queryset, update_search_index
+)
 
 User = get_user_model()
 
@@ -57,6 +68,12 @@ class Subscribe(models.Model):
                 name='unique_user_owner'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['owner', 'user'],
+                name='subscribe_owner_user_idx'
+            )
+        ]
         verbose_name = 'подписка'
         verbose_name_plural = 'Подписки'
 
@@ -64,7 +81,100 @@ class Subscribe(models.Model):
         return str(self.user)
 
 
-class Recipe(models.Model):
+def annotate_is_subscribed(queryset, user):
+    if not user.is_authenticated:
+        return queryset.annotate(
+            is_subscribed=Value(False, output_field=BooleanField())
+        )
+    return queryset.annotate(
+        is_subscribed=Exists(Subscribe.objects.filter(
+            user=user, owner=OuterRef('pk')
+        ))
+    )
+
+
+class RecipeQuerySet(models.QuerySet):
+
+    def with_user_flags(self, user):
+        if not user.is_authenticated:
+            return self.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField())
+            )
+        return self.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            ))
+        )
+
+    def with_related(self, user):
+        return self.prefetch_related(
+            Prefetch(
+                'author',
+                queryset=annotate_is_subscribed(
+                    User.objects.only(
+                        'email', 'username', 'first_name',
+                        'last_name', 'avatar'
+                    ),
+                    user
+                )
+            ),
+            Prefetch(
+                'tags_recipes',
+                queryset=TagRecipe.objects.select_related('tag').only(
+                    'recipe', 'tag__name', 'tag__slug'
+                )
+            ),
+            Prefetch(
+                'ingredients_recipes',
+                queryset=IngredientRecipe.objects.select_related(
+                    'ingredient'
+                ).only(
+                    'recipe', 'amount',
+                    'ingredient__name', 'ingredient__measurement_unit'
+                )
+            )
+        )
+
+    def limit_per_author(self, limit):
+        if limit is None:
+            return self
+        ranked = self.annotate(
+            row_number=Window(
+                expression=RowNumber(),
+                partition_by=F('author'),
+                order_by=(F('created_at').asc(), F('id').asc())
+            )
+        ).values('id', 'row_number')
+        try:
+            sql, params = ranked.query.sql_with_params()
+        except EmptyResultSet:
+            return self.none()
+        return self.filter(id__in=RawSQL(
+            f'SELECT id FROM ({sql}) AS ranked WHERE row_number <= %s',
+            (*params, limit)
+        ))
+
+    def search(self, value):
+        return search_queryset(self, value)
+
+    def update_search_index(self):
+        update_search_index(self)
+
+    def remove_from_search_index(self, ids):
+        remove_from_search_index(self, ids)
+
+
+class RecipeManager(models.Manager.from_queryset(RecipeQuerySet)):
+
+    def get_queryset(self):
+        return super().get_queryset().defer('search_vector')
+
+
+class Recipe(CounterFieldsMixin, models.Model):
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -101,6 +211,26 @@ class Recipe(models.Model):
         auto_now=True,
         verbose_name='Дата редактирования'
     )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество добавлений в избранное'
+    )
+    in_carts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество добавлений в список покупок'
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Поисковый вектор'
+    )
+    similar_updated_at = models.DateTimeField(
+        null=True,
+        editable=False,
+        verbose_name='Дата расчёта похожих рецептов'
+    )
+    objects = RecipeManager()
+    counter_fields = ('favorites_count', 'in_carts_count')
     REQUIRED_FIELDS = [
         'ingredients',
         'tags',
@@ -112,6 +242,20 @@ class Recipe(models.Model):
 
     class Meta:
         default_related_name = 'recipes'
+        indexes = [
+            models.Index(
+                fields=['created_at', 'id'],
+                name='recipe_created_at_idx'
+            ),
+            models.Index(
+                fields=['author', 'created_at'],
+                name='recipe_author_created_at_idx'
+            ),
+            models.Index(
+                fields=['-favorites_count', 'id'],
+                name='recipe_favorites_count_idx'
+            )
+        ]
         verbose_name = 'рецепт'
         verbose_name_plural = 'Рецепты'
 
@@ -127,6 +271,12 @@ class FavoriteShoppingCart(models.Model):
 
     class Meta:
         abstract = True
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_%(class)s_user_recipe'
+            )
+        ]
 
     def __str__(self):
         return str(self.user)
@@ -197,7 +347,7 @@ class TagRecipe(models.Model):
 
 class Favorite(FavoriteShoppingCart):
 
-    class Meta:
+    class Meta(FavoriteShoppingCart.Meta):
         default_related_name = 'favorites'
         verbose_name = 'избранное'
         verbose_name_plural = 'Избранные'
@@ -205,7 +355,70 @@ class Favorite(FavoriteShoppingCart):
 
 class ShoppingCart(FavoriteShoppingCart):
 
-    class Meta:
+    class Meta(FavoriteShoppingCart.Meta):
         default_related_name = 'shopping_carts'
         verbose_name = 'список покупок'
         verbose_name_plural = 'Списки покупок'
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Подписчик'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        verbose_name='Рецепт'
+    )
+    created_at = models.DateTimeField(verbose_name='Дата создания рецепта')
+
+    class Meta:
+        default_related_name = 'feed_entries'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_feed_entry_user_recipe'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-created_at', '-recipe'],
+                name='feed_entry_user_created_idx'
+            )
+        ]
+        verbose_name = 'запись ленты'
+        verbose_name_plural = 'Лента подписок'
+
+    def __str__(self):
+        return str(self.recipe)
+
+
+class SimilarRecipe(models.Model):
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_recipes',
+        verbose_name='Рецепт'
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_for',
+        verbose_name='Похожий рецепт'
+    )
+    score = models.FloatField(verbose_name='Сходство')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'similar'],
+                name='unique_similar_recipe'
+            )
+        ]
+        verbose_name = 'похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+
+    def __str__(self):
+        return str(self.similar)
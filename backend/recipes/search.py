@@ -0,0 +1,74 @@
+import re
+
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVector
+)
+from django.db import connections
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+SEARCH_CONFIG = 'russian'
+FTS_TABLE = 'recipes_recipe_fts'
+
+
+def get_vendor(queryset):
+    return connections[queryset.db].vendor
+
+
+def get_fts_query(value):
+    return ' '.join(
+        f'"{word}"*' for word in re.findall(r'\w+', value.lower())
+    )
+
+
+def search_queryset(queryset, value):
+    vendor = get_vendor(queryset)
+    if vendor == 'postgresql':
+        query = SearchQuery(
+            value, config=SEARCH_CONFIG, search_type='websearch'
+        )
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        )
+    if vendor == 'sqlite':
+        fts_query = get_fts_query(value)
+        if not fts_query:
+            return queryset.none()
+        return queryset.annotate(search_rank=RawSQL(
+            f'SELECT -bm25({FTS_TABLE}, 10.0, 1.0) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s '
+            f'AND rowid = {queryset.model._meta.db_table}.id',
+            [fts_query],
+            output_field=FloatField()
+        )).filter(search_rank__isnull=False)
+    return queryset.filter(
+        Q(name__icontains=value) | Q(text__icontains=value)
+    ).annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+
+def update_search_index(queryset):
+    vendor = get_vendor(queryset)
+    if vendor == 'postgresql':
+        queryset.update(search_vector=(
+            SearchVector('name', weight='A', config=SEARCH_CONFIG)
+            + SearchVector('text', weight='B', config=SEARCH_CONFIG)
+        ))
+    elif vendor == 'sqlite':
+        rows = list(queryset.values_list('id', 'name', 'text'))
+        remove_from_search_index(queryset, [row[0] for row in rows])
+        with connections[queryset.db].cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, text) '
+                'VALUES (%s, %s, %s)',
+                rows
+            )
+
+
+def remove_from_search_index(queryset, ids):
+    if get_vendor(queryset) != 'sqlite':
+        return
+    with connections[queryset.db].cursor() as cursor:
+        cursor.executemany(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+            [(pk,) for pk in ids]
+        )
@@ -0,0 +1,94 @@
+import heapq
+from collections import defaultdict
+
+from .models import IngredientRecipe, TagRecipe
+
+MIN_POSTINGS_LIMIT = 1000
+
+_state = {}
+
+
+def load_features():
+    ingredients, tags = defaultdict(set), defaultdict(set)
+    for recipe_id, ingredient_id in IngredientRecipe.objects.values_list(
+        'recipe_id', 'ingredient_id'
+    ).iterator():
+        ingredients[recipe_id].add(ingredient_id)
+    for recipe_id, tag_id in TagRecipe.objects.values_list(
+        'recipe_id', 'tag_id'
+    ).iterator():
+        tags[recipe_id].add(tag_id)
+    return (
+        {key: frozenset(value) for key, value in ingredients.items()},
+        {key: frozenset(value) for key, value in tags.items()}
+    )
+
+
+def build_postings(ingredients):
+    postings = defaultdict(list)
+    for recipe_id, features in ingredients.items():
+        for feature in features:
+            postings[feature].append(recipe_id)
+    return dict(postings)
+
+
+def init_worker(ingredients, tags, postings, max_df, top_k, tag_weight):
+    _state.update(
+        ingredients=ingredients,
+        tags=tags,
+        postings=postings,
+        postings_limit=max(
+            int(len(ingredients) * max_df), MIN_POSTINGS_LIMIT
+        ),
+        top_k=top_k,
+        tag_weight=tag_weight
+    )
+
+
+def get_candidates(features):
+    """Кандидаты берутся по редким ингредиентам: соль и масло есть почти
+    везде и превращают расчёт в перебор всех пар. Если редких нет,
+    используется самый редкий из имеющихся."""
+    postings = [_state['postings'][feature] for feature in features]
+    rare = [
+        recipe_ids for recipe_ids in postings
+        if len(recipe_ids) <= _state['postings_limit']
+    ]
+    if not rare and postings:
+        rare = [min(postings, key=len)]
+    candidates = set()
+    for recipe_ids in rare:
+        candidates.update(recipe_ids)
+    return candidates
+
+
+def jaccard(first, second):
+    if not first or not second:
+        return 0.0
+    common = len(first & second)
+    return common / (len(first) + len(second) - common)
+
+
+def score_recipe(recipe_id):
+    ingredients, tags = _state['ingredients'], _state['tags']
+    own = ingredients.get(recipe_id, frozenset())
+    own_tags = tags.get(recipe_id, frozenset())
+    candidates = get_candidates(own)
+    candidates.discard(recipe_id)
+    tag_weight = _state['tag_weight']
+    scored = (
+        (
+            jaccard(own, ingredients[candidate]) * (1 - tag_weight)
+            + jaccard(own_tags, tags.get(candidate, frozenset()))
+            * tag_weight,
+            -candidate
+        ) for candidate in candidates
+    )
+    return [
+        (-negative_id, score) for score, negative_id
+        in heapq.nlargest(_state['top_k'], scored)
+    ]
+
+
+def score_chunk(recipe_ids):
+    return [(recipe_id, score_recipe(recipe_id)) for recipe_id in recipe_ids]
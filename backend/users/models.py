@@ -2,11 +2,12 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 
 from .manager import CustomUserManager
+from recipes.counters import CounterFieldsMixin
 
 VALID_NAME_VALUES = 150
 
 
-class CustomUser(AbstractUser):
+class CustomUser(CounterFieldsMixin, AbstractUser):
     email = models.EmailField(
         unique=True,
         verbose_name='Адрес электронной почты'
@@ -24,7 +25,12 @@ class CustomUser(AbstractUser):
         max_length=VALID_NAME_VALUES,
         verbose_name='Фамилия'
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество рецептов'
+    )
     objects = CustomUserManager()
+    counter_fields = ('recipes_count',)
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['first_name', 'username', 'last_name', ]
 